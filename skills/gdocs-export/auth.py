@@ -0,0 +1,74 @@
+"""
+Google OAuth credentials shared by the gdocs-export scripts.
+"""
+
+import datetime
+import functools
+import os
+import sys
+from typing import Tuple
+
+try:
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+except ImportError as e:
+    print(f"Error: Missing required package. Install with: pip install -r requirements.txt", file=sys.stderr)
+    print(f"Missing: {e.name}", file=sys.stderr)
+    sys.exit(1)
+
+# Refresh tokens this long before they expire, so a long (threaded) export
+# doesn't have every worker hit an expired token mid-run
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+
+def _expires_soon(creds) -> bool:
+    """Check if the access token expires within REFRESH_MARGIN."""
+    if not creds.expiry:
+        return False
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return creds.expiry - REFRESH_MARGIN <= now
+
+
+def save_credentials(creds, token_file: str):
+    """Write credentials to the token file atomically so concurrent runs can't corrupt it."""
+    tmp_file = f"{token_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as token:
+        token.write(creds.to_json())
+    os.replace(tmp_file, token_file)
+
+
+@functools.lru_cache(maxsize=None)
+def get_credentials(scopes: Tuple[str, ...], token_file: str):
+    """
+    Get valid user credentials from storage or OAuth flow.
+
+    Cached per (scopes, token_file), so repeated calls in one process skip
+    reading and parsing the token file.
+    """
+    creds = None
+
+    # Try OAuth token file
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, list(scopes))
+
+    if creds and creds.refresh_token and (not creds.valid or _expires_soon(creds)):
+        creds.refresh(Request())
+        save_credentials(creds, token_file)
+    elif not creds or not creds.valid:
+        # No (valid) credentials available, let the user log in
+        client_secret_file = os.environ.get('GOOGLE_CLIENT_SECRET_FILE')
+        if not client_secret_file or not os.path.exists(client_secret_file):
+            print("Error: No valid credentials found.", file=sys.stderr)
+            print("Set GOOGLE_CLIENT_SECRET_FILE environment variable.", file=sys.stderr)
+            sys.exit(1)
+
+        flow = InstalledAppFlow.from_client_secrets_file(
+            client_secret_file, list(scopes))
+        creds = flow.run_local_server(port=0)
+
+        # Save the credentials for the next run
+        save_credentials(creds, token_file)
+
+    return creds
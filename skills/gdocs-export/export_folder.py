@@ -5,24 +5,27 @@ Lists all Google Docs in a folder and exports them to markdown.
 """
 
 import argparse
+import json
 import os
+import random
 import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 try:
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from googleapiclient.discovery import build
     from googleapiclient.errors import HttpError
 except ImportError as e:
     print(f"Error: Missing required package. Install with: pip install -r requirements.txt", file=sys.stderr)
     print(f"Missing: {e.name}", file=sys.stderr)
     sys.exit(1)
 
+from auth import get_credentials
+
 # Import the document conversion function from gdoc2md
-from gdoc2md import convert_document_to_markdown, sanitize_filename
+from gdoc2md import DOCUMENT_FIELDS, build_service, sanitize_filename, write_document_to_file
 
 # Scopes required - need Drive readonly to list folder contents
 SCOPES = [
@@ -33,42 +36,72 @@ SCOPES = [
 # OAuth token file location - use a separate token file since we need additional scopes
 TOKEN_FILE = os.path.expanduser('~/.google-drive-token.json')
 
+# Pattern to find the folder ID in a Drive folder URL
+FOLDER_ID_PATTERN = re.compile(r'folders/([a-zA-Z0-9_-]+)')
+
+# Drive's maximum files.list page size (the default is 100)
+PAGE_SIZE = 1000
+
+# Parallel export settings - keep the worker cap modest to stay under
+# Google's per-user request quota
+DEFAULT_WORKERS = 8
+MAX_WORKERS = 16
+
+# Threads dedicated to converting and writing markdown files
+IO_WORKERS = 4
+
+# Docs API batch requests are limited to 100 sub-requests
+BATCH_SIZE = 100
+
+# Docs API read quota is 300 requests per minute per user; each document in a
+# batch counts as one request
+DOCS_READS_PER_MINUTE = 300
+DOCS_READ_BURST = BATCH_SIZE
+
+# Retry rate limit (429) and transient server errors with exponential backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_TRIES = 6
+MAX_BACKOFF = 64
+
+# Sidecar file in the output directory recording each exported doc's modifiedTime
+EXPORT_CACHE_FILE = '.export-cache.json'
 
-def get_credentials():
-    """Get valid user credentials from storage or OAuth flow."""
-    creds = None
+# googleapiclient service objects (and their HTTP transport) are not
+# thread-safe, so each worker thread builds and keeps its own Docs service
+_thread_local = threading.local()
 
-    # Try OAuth token file
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
 
-    # If there are no (valid) credentials available, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            client_secret_file = os.environ.get('GOOGLE_CLIENT_SECRET_FILE')
-            if not client_secret_file or not os.path.exists(client_secret_file):
-                print("Error: No valid credentials found.", file=sys.stderr)
-                print("Set GOOGLE_CLIENT_SECRET_FILE environment variable.", file=sys.stderr)
-                sys.exit(1)
+class RateLimiter:
+    """Token bucket shared across threads to stay under a per-minute request quota."""
 
-            flow = InstalledAppFlow.from_client_secrets_file(
-                client_secret_file, SCOPES)
-            creds = flow.run_local_server(port=0)
+    def __init__(self, per_minute: int, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
 
-        # Save the credentials for the next run
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
+    def acquire(self, count: int = 1):
+        """Block until count requests may be sent (at most the burst size at once)."""
+        count = min(count, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                wait = (count - self.tokens) / self.rate
+            time.sleep(wait)
 
-    return creds
+
+docs_read_limiter = RateLimiter(DOCS_READS_PER_MINUTE, DOCS_READ_BURST)
 
 
 def extract_folder_id(url_or_id: str) -> str:
     """Extract folder ID from a Google Drive URL or return the ID if already extracted."""
-    # Pattern for folder URLs
-    folder_pattern = r'folders/([a-zA-Z0-9_-]+)'
-    match = re.search(folder_pattern, url_or_id)
+    match = FOLDER_ID_PATTERN.search(url_or_id)
     if match:
         return match.group(1)
     # Assume it's already a folder ID
@@ -89,6 +122,7 @@ def list_google_docs_in_folder(drive_service, folder_id: str) -> list:
                 q=query,
                 spaces='drive',
                 fields='nextPageToken, files(id, name, modifiedTime)',
+                pageSize=PAGE_SIZE,
                 pageToken=page_token,
                 orderBy='name',
                 supportsAllDrives=True,
@@ -113,47 +147,122 @@ def list_google_docs_in_folder(drive_service, folder_id: str) -> list:
     return docs
 
 
-def export_doc_to_markdown(docs_service, doc_id: str, doc_name: str, output_dir: Path, force: bool = False) -> bool:
-    """Export a single Google Doc to markdown."""
-    output_file = output_dir / sanitize_filename(doc_name)
-
-    # Check if file exists
-    if output_file.exists() and not force:
-        print(f"  Skipping '{doc_name}' - file exists. Use --force to overwrite.", file=sys.stderr)
-        return False
+def get_docs_service(creds):
+    """Get the Docs API service for the current thread, building it on first use."""
+    if not hasattr(_thread_local, 'docs_service'):
+        _thread_local.docs_service = build_service('docs', 'v1', creds)
+    return _thread_local.docs_service
 
-    try:
-        # Get document with tabs content
-        doc = docs_service.documents().get(
-            documentId=doc_id,
-            includeTabsContent=True
-        ).execute()
 
-        # Convert to markdown
-        sections = convert_document_to_markdown(doc)
-        _, markdown = sections[0]
+def is_retryable(error) -> bool:
+    """Check if a fetch result is a rate limit or transient server error."""
+    return isinstance(error, HttpError) and error.resp.status in RETRY_STATUSES
 
-        # Write to file
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(markdown)
 
+def retry_delay(error: HttpError, attempt: int) -> float:
+    """Get the wait before retry attempt+1: exponential backoff, at least the server's Retry-After, with jitter."""
+    try:
+        retry_after = int(error.resp.get('retry-after') or 0)
+    except ValueError:
+        # HTTP-date form - fall back to exponential backoff
+        retry_after = 0
+    return max(retry_after, min(MAX_BACKOFF, 2 ** attempt)) + random.uniform(0, 1)
+
+
+def fetch_documents(docs_service, doc_ids: list) -> dict:
+    """
+    Fetch documents (with tabs content) using batched documents.get calls.
+
+    Every document counts against the shared read limiter. Documents that hit a
+    rate limit or server error are re-batched after backing off. Returns a dict
+    of doc_id -> document, or doc_id -> HttpError for documents that failed, so
+    one bad doc doesn't fail the whole batch.
+    """
+    results = {}
+
+    def on_doc_loaded(request_id, response, exception):
+        results[request_id] = exception if exception is not None else response
+
+    pending = doc_ids
+    for attempt in range(MAX_TRIES):
+        for i in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[i:i + BATCH_SIZE]
+            docs_read_limiter.acquire(len(chunk))
+            batch = docs_service.new_batch_http_request(callback=on_doc_loaded)
+            for doc_id in chunk:
+                batch.add(
+                    docs_service.documents().get(documentId=doc_id, includeTabsContent=True, fields=DOCUMENT_FIELDS),
+                    request_id=doc_id
+                )
+            try:
+                batch.execute()
+            except HttpError as e:
+                if not is_retryable(e):
+                    raise
+                # The whole batch was turned away, so every document in it retries
+                results.update(dict.fromkeys(chunk, e))
+
+        pending = [doc_id for doc_id in pending if is_retryable(results.get(doc_id))]
+        if not pending or attempt == MAX_TRIES - 1:
+            break
+        delay = max(retry_delay(results[doc_id], attempt) for doc_id in pending)
+        print(f"  API error on {len(pending)} document(s), retrying in {delay:.1f}s...", file=sys.stderr)
+        time.sleep(delay)
+
+    return results
+
+
+def export_doc_to_markdown(doc: dict, doc_name: str, output_file: Path) -> bool:
+    """Convert a fetched Google Doc to markdown, streaming it into output_file."""
+    try:
+        # A failed conversion leaves any previous export of the doc in place
+        write_document_to_file(doc, output_file)
         print(f"  Exported: {doc_name} -> {output_file.name}", file=sys.stderr)
         return True
 
-    except HttpError as e:
-        if e.resp.status == 404:
-            print(f"  Error: Document '{doc_name}' not found.", file=sys.stderr)
-        elif e.resp.status == 403:
-            print(f"  Error: Permission denied for '{doc_name}'.", file=sys.stderr)
-        else:
-            print(f"  Error exporting '{doc_name}': {e}", file=sys.stderr)
-        return False
     except Exception as e:
         print(f"  Error exporting '{doc_name}': {e}", file=sys.stderr)
         return False
 
 
+def existing_filenames(output_dir: Path) -> set:
+    """Get the names of all entries in output_dir."""
+    try:
+        with os.scandir(output_dir) as entries:
+            return {entry.name for entry in entries}
+    except FileNotFoundError:
+        return set()
+
+
+def load_export_cache(output_dir: Path) -> dict:
+    """Load the {doc_id: modifiedTime} map saved by the previous export, if any."""
+    try:
+        with open(output_dir / EXPORT_CACHE_FILE, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_export_cache(output_dir: Path, cache: dict):
+    """Write the export cache atomically so an interrupted run can't corrupt it."""
+    cache_file = output_dir / EXPORT_CACHE_FILE
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
+
+
+def print_fetch_error(doc_name: str, error: Exception):
+    """Report a document that could not be fetched."""
+    if isinstance(error, HttpError) and error.resp.status == 404:
+        print(f"  Error: Document '{doc_name}' not found.", file=sys.stderr)
+    elif isinstance(error, HttpError) and error.resp.status == 403:
+        print(f"  Error: Permission denied for '{doc_name}'.", file=sys.stderr)
+    else:
+        print(f"  Error exporting '{doc_name}': {error}", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Export all Google Docs from a Drive folder to markdown'
@@ -173,11 +282,22 @@ def main():
         action='store_true',
         help='Overwrite existing files without prompting'
     )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Re-export existing files only if the document changed since the last export'
+    )
     parser.add_argument(
         '--list-only',
         action='store_true',
         help='Only list the documents, do not export'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Number of parallel export workers (default: {DEFAULT_WORKERS}, max: {MAX_WORKERS})'
+    )
 
     args = parser.parse_args()
 
@@ -186,15 +306,14 @@ def main():
 
     # Get credentials
     try:
-        creds = get_credentials()
+        creds = get_credentials(tuple(SCOPES), TOKEN_FILE)
     except Exception as e:
         print(f"Error getting credentials: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # Build services
+    # Build services (Docs services are built per worker thread)
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        docs_service = build('docs', 'v1', credentials=creds)
+        drive_service = build_service('drive', 'v3', creds)
     except Exception as e:
         print(f"Error building service: {e}", file=sys.stderr)
         sys.exit(1)
@@ -221,10 +340,73 @@ def main():
     # Export each document
     print(f"\nExporting to: {output_dir.absolute()}", file=sys.stderr)
 
-    success_count = 0
+    # Skip documents that were already exported (one directory scan instead of a stat per doc).
+    # With --sync, existing files are re-exported only when Drive reports a newer modifiedTime,
+    # so an unchanged folder needs no Docs API calls at all.
+    existing = existing_filenames(output_dir)
+    cache = load_export_cache(output_dir)
+    claimed = set()
+    pending = []
     for doc in docs:
-        if export_doc_to_markdown(docs_service, doc['id'], doc['name'], output_dir, args.force):
-            success_count += 1
+        output_file = output_dir / sanitize_filename(doc['name'])
+        # Titles that sanitize to the same filename would race on one file, so
+        # the first document with a name owns it
+        if output_file.name in claimed:
+            print(f"  Skipping '{doc['name']}' - another document also exports to {output_file.name}.", file=sys.stderr)
+            continue
+        claimed.add(output_file.name)
+        if output_file.name in existing and not args.force:
+            if not args.sync:
+                print(f"  Skipping '{doc['name']}' - file exists. Use --force to overwrite.", file=sys.stderr)
+                continue
+            if doc.get('modifiedTime') and cache.get(doc['id']) == doc['modifiedTime']:
+                print(f"  Skipping '{doc['name']}' - unchanged since last export.", file=sys.stderr)
+                continue
+        pending.append((doc, output_file))
+
+    # Give each worker one batch (of up to BATCH_SIZE docs) so batches are fetched in parallel
+    workers = max(1, min(args.workers, MAX_WORKERS))
+    batch_size = min(BATCH_SIZE, max(1, -(-len(pending) // workers)))
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    def export_batch(batch):
+        docs_service = get_docs_service(creds)
+        fetched = fetch_documents(docs_service, [doc['id'] for doc, _ in batch])
+        writes = {}
+        for doc, output_file in batch:
+            result = fetched.get(doc['id'])
+            if not isinstance(result, dict):
+                print_fetch_error(doc['name'], result or Exception('no response'))
+                continue
+            writes[io_pool.submit(export_doc_to_markdown, result, doc['name'], output_file)] = doc
+        return writes
+
+    # Converting and writing happen on the I/O pool, overlapping with fetches
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as io_pool:
+        writes = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(export_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    writes.update(future.result())
+                except Exception as e:
+                    for doc, _ in futures[future]:
+                        print_fetch_error(doc['name'], e)
+
+        success_count = 0
+        for write in as_completed(writes):
+            if write.result():
+                success_count += 1
+                doc = writes[write]
+                if doc.get('modifiedTime'):
+                    cache[doc['id']] = doc['modifiedTime']
+
+    # Remember what was exported so the next --sync run can skip unchanged docs
+    if success_count:
+        try:
+            save_export_cache(output_dir, cache)
+        except OSError as e:
+            print(f"Warning: Could not write {EXPORT_CACHE_FILE}: {e}", file=sys.stderr)
 
     print(f"\nExported {success_count}/{len(docs)} document(s).", file=sys.stderr)
 
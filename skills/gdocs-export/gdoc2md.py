@@ -5,23 +5,36 @@ Exports Google Documents to markdown format using the Google Docs API.
 """
 
 import argparse
+import functools
+import io
 import os
 import re
 import sys
+import time
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, TextIO, Tuple
 
 try:
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from googleapiclient.discovery import build
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient import discovery_cache
+    from googleapiclient.discovery import DISCOVERY_URI, build_from_document
     from googleapiclient.errors import HttpError
+    from googleapiclient.model import JsonModel
 except ImportError as e:
     print(f"Error: Missing required package. Install with: pip install -r requirements.txt", file=sys.stderr)
     print(f"Missing: {e.name}", file=sys.stderr)
     sys.exit(1)
 
+# Optional: orjson parses large API responses several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from auth import get_credentials
+
 # Scopes required for Google Docs API
 SCOPES = [
     'https://www.googleapis.com/auth/documents.readonly',
@@ -30,151 +43,215 @@ SCOPES = [
 # OAuth token file location
 TOKEN_FILE = os.path.expanduser('~/.google-docs-token.json')
 
+# Socket timeout (seconds) for API requests
+HTTP_TIMEOUT = 30
+
+# documents.get fields the converter reads - without a mask the response also
+# carries every style, list, inline object and suggestion in the document.
+# bullet keeps listId since a zero nestingLevel is omitted from responses.
+_CONTENT_FIELDS = (
+    'content('
+    'paragraph(elements/textRun(content,textStyle(bold,italic,underline,link/url)),'
+    'paragraphStyle/namedStyleType,bullet(listId,nestingLevel)),'
+    'table/tableRows/tableCells/content/paragraph/elements/textRun/content,'
+    'sectionBreak)'
+)
+_TAB_FIELDS = f'tabProperties/title,documentTab/body/{_CONTENT_FIELDS}'
+
+# Docs allows child tabs nested up to three levels deep
+_TAB_TREE_FIELDS = _TAB_FIELDS
+for _ in range(3):
+    _TAB_TREE_FIELDS = f'{_TAB_FIELDS},childTabs({_TAB_TREE_FIELDS})'
+
+DOCUMENT_FIELDS = f'title,body/{_CONTENT_FIELDS},tabs({_TAB_TREE_FIELDS})'
+
+# Markdown emphasis markers keyed by (bold, italic)
+_EMPHASIS = {
+    (False, False): '',
+    (True, False): '**',
+    (False, True): '*',
+    (True, True): '***',
+}
+
+# (prefix, suffix) wrapping a text run, keyed by (bold, italic, underline)
+_RUN_WRAPPERS = {
+    (bold, italic, underline): (
+        ('<u>' if underline else '') + emphasis,
+        emphasis + ('</u>' if underline else ''),
+    )
+    for (bold, italic), emphasis in _EMPHASIS.items()
+    for underline in (False, True)
+}
 
-def get_credentials():
-    """Get valid user credentials from storage or OAuth flow."""
-    creds = None
+# Heading markers by named style (unknown heading styles fall back to H1)
+_HEADING_MARKERS = {f'HEADING_{level}': '#' * level for level in range(1, 7)}
 
-    # Try OAuth token file
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
 
-    # If there are no (valid) credentials available, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            client_secret_file = os.environ.get('GOOGLE_CLIENT_SECRET_FILE')
-            if not client_secret_file or not os.path.exists(client_secret_file):
-                print("Error: No valid credentials found.", file=sys.stderr)
-                print("Set GOOGLE_CLIENT_SECRET_FILE environment variable.", file=sys.stderr)
-                sys.exit(1)
+def _bullet_prefix(nesting_level: int) -> str:
+    """Get the indent and list marker for a bullet at the given nesting level."""
+    marker = '- ' if nesting_level == 0 else '  - '
+    return '  ' * nesting_level + marker
 
-            flow = InstalledAppFlow.from_client_secrets_file(
-                client_secret_file, SCOPES)
-            creds = flow.run_local_server(port=0)
 
-        # Save the credentials for the next run
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
+# Bullet prefixes for common nesting levels
+_BULLET_PREFIXES = tuple(_bullet_prefix(level) for level in range(16))
 
-    return creds
+# Filename sanitizing: characters to drop, and whitespace/dash runs to collapse into one dash
+_INVALID_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*')
+_SEPARATOR_PATTERN = re.compile(r'[\s-]+')
+# Titles containing none of these (nor uppercase or '--') are already valid filenames
+_UNSAFE_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?* \t\n\r\f\v\x1c\x1d\x1e\x1f\x85')
 
+# Table cell escaping: pipes would end the cell, newlines would end the row
+_CELL_ESCAPES = str.maketrans({'|': '\\|', '\n': ' '})
+
+# Bold/italic markers to strip from section titles
+_EMPHASIS_PATTERN = re.compile(r'\*\*?([^*]+)\*\*?')
+
+# On-disk cache for discovery documents that aren't bundled with googleapiclient
+DISCOVERY_CACHE_DIR = Path(os.path.expanduser('~/.cache/gdocs-export'))
+DISCOVERY_CACHE_TTL = 24 * 60 * 60
 
-def extract_text_runs(element: Dict) -> str:
-    """Extract text from a text run element."""
-    if 'textRun' in element:
-        return element['textRun'].get('content', '')
-    return ''
 
+class OrjsonModel(JsonModel):
+    """JsonModel that deserializes API responses with orjson."""
 
-def get_text_style(element: Dict) -> Dict:
-    """Get text style from an element."""
-    if 'textRun' in element and 'textStyle' in element['textRun']:
-        return element['textRun']['textStyle']
-    return {}
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().deserialize(content)
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
 
 
-def is_bold(style: Dict) -> bool:
-    """Check if text is bold."""
-    return style.get('bold', False)
+@functools.lru_cache(maxsize=None)
+def get_discovery_document(api: str, version: str) -> str:
+    """
+    Get the discovery document JSON for an API, avoiding a network fetch where possible.
 
+    Uses the copy bundled with googleapiclient, then a local cache (refreshed
+    daily), and only then downloads it. The result is kept for the life of the
+    process so per-thread services don't re-read it.
+    """
+    content = discovery_cache.get_static_doc(api, version)
+    if content is not None:
+        return content
 
-def is_italic(style: Dict) -> bool:
-    """Check if text is italic."""
-    return style.get('italic', False)
+    cache_file = DISCOVERY_CACHE_DIR / f'{api}-{version}.json'
+    try:
+        if time.time() - cache_file.stat().st_mtime < DISCOVERY_CACHE_TTL:
+            return cache_file.read_text(encoding='utf-8')
+    except OSError:
+        pass
+
+    uri = DISCOVERY_URI.format(api=api, apiVersion=version)
+    resp, content = httplib2.Http(timeout=HTTP_TIMEOUT).request(uri)
+    if resp.status >= 400:
+        raise HttpError(resp, content, uri=uri)
+    content = content.decode('utf-8')
+
+    # Cache for next run (best effort - a failed write only costs a refetch)
+    try:
+        DISCOVERY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_file.write_text(content, encoding='utf-8')
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
 
+    return content
 
-def is_underline(style: Dict) -> bool:
-    """Check if text is underlined."""
-    return style.get('underline', False)
 
+def build_service(api: str, version: str, creds, http=None):
+    """
+    Build a Google API service over a persistent, authorized HTTP connection.
 
-def get_link(style: Dict) -> Optional[str]:
-    """Get link URL from text style."""
-    if 'link' in style:
-        return style['link'].get('url')
-    return None
+    Pass the same `http` to several services to share one keep-alive connection
+    between them. The transport is not thread-safe, so use one per thread.
+    """
+    if http is None:
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    model = OrjsonModel() if orjson else None
+    return build_from_document(get_discovery_document(api, version), http=http, model=model)
 
 
-def convert_paragraph_to_markdown(paragraph: Dict, level: int = 0) -> str:
-    """Convert a paragraph element to markdown."""
-    result = []
-    
+def extract_text_runs(element: Dict) -> str:
+    """Extract text from a text run element."""
+    if 'textRun' in element:
+        return element['textRun'].get('content', '')
+    return ''
+
+
+def convert_paragraph_to_markdown(paragraph: Dict, buf: TextIO, level: int = 0):
+    """Convert a paragraph element to markdown, writing it to buf."""
     if 'paragraph' not in paragraph:
-        return ''
+        return
     
     para = paragraph['paragraph']
     para_style = para.get('paragraphStyle', {})
     named_style = para_style.get('namedStyleType', 'NORMAL_TEXT')
     
-    # Extract text from elements
+    # Extract text from elements (joined once so trailing whitespace can be trimmed)
     text_parts = []
     for element in para.get('elements', []):
-        text = extract_text_runs(element)
+        text_run = element.get('textRun')
+        if not text_run:
+            continue
+        text = text_run.get('content')
         if not text:
             continue
         
-        style = get_text_style(element)
-        link = get_link(style)
-        
-        # Apply formatting (order matters: bold/italic before links)
-        formatted_text = text
-        if is_bold(style) and is_italic(style):
-            formatted_text = f"***{formatted_text}***"
-        elif is_bold(style):
-            formatted_text = f"**{formatted_text}**"
-        elif is_italic(style):
-            formatted_text = f"*{formatted_text}*"
-        
-        if is_underline(style):
-            formatted_text = f"<u>{formatted_text}</u>"
+        # Fast path: most runs are plain text with no style at all
+        style = text_run.get('textStyle')
+        if not style:
+            text_parts.append(text)
+            continue
         
-        # Links should wrap the formatted text
+        # Apply formatting (bold/italic inside underline; links wrap the formatted text)
+        prefix, suffix = _RUN_WRAPPERS[
+            bool(style.get('bold')), bool(style.get('italic')), bool(style.get('underline'))
+        ]
+        link = style['link'].get('url') if 'link' in style else None
         if link:
-            formatted_text = f"[{formatted_text}]({link})"
-        
-        text_parts.append(formatted_text)
+            text_parts.append(f"[{prefix}{text}{suffix}]({link})")
+        else:
+            text_parts.append(f"{prefix}{text}{suffix}")
     
     text = ''.join(text_parts).rstrip()
     
     # Handle different paragraph styles
     if named_style.startswith('HEADING_'):
-        level_map = {
-            'HEADING_1': 1,
-            'HEADING_2': 2,
-            'HEADING_3': 3,
-            'HEADING_4': 4,
-            'HEADING_5': 5,
-            'HEADING_6': 6,
-        }
-        heading_level = level_map.get(named_style, 1)
-        return f"{'#' * heading_level} {text}\n"
+        buf.write(f"{_HEADING_MARKERS.get(named_style, '#')} {text}\n")
     elif para.get('bullet'):
-        bullet = para['bullet']
-        list_id = bullet.get('listId')
-        nesting_level = bullet.get('nestingLevel', 0)
-        indent = '  ' * nesting_level
-        marker = '- ' if nesting_level == 0 else '  - '
-        return f"{indent}{marker}{text}\n"
+        nesting_level = para['bullet'].get('nestingLevel', 0)
+        if nesting_level < len(_BULLET_PREFIXES):
+            prefix = _BULLET_PREFIXES[nesting_level]
+        else:
+            prefix = _bullet_prefix(nesting_level)
+        buf.write(f"{prefix}{text}\n")
     elif text.strip():
-        return f"{text}\n"
-    
-    return '\n'
+        buf.write(f"{text}\n")
+    else:
+        buf.write('\n')
 
 
-def convert_table_to_markdown(table: Dict) -> str:
-    """Convert a table element to markdown."""
-    result = []
-    
+def escape_cell(cell) -> str:
+    """Escape pipe characters and flatten newlines in table cell content."""
+    return str(cell).translate(_CELL_ESCAPES)
+
+
+def convert_table_to_markdown(table: Dict, buf: TextIO):
+    """Convert a table element to markdown, writing it to buf."""
     if 'table' not in table:
-        return ''
+        return
     
     table_data = table['table']
     rows = table_data.get('tableRows', [])
     
     if not rows:
-        return ''
+        return
     
     # Extract table data
     table_rows = []
@@ -189,70 +266,106 @@ def convert_table_to_markdown(table: Dict) -> str:
             row_data.append(' '.join(cell_text).strip())
         table_rows.append(row_data)
     
-    if not table_rows:
-        return ''
-    
-    # Generate markdown table
-    if not table_rows:
-        return ''
-    
-    num_cols = max(len(row) for row in table_rows) if table_rows else 0
+    num_cols = max(len(row) for row in table_rows)
     if num_cols == 0:
-        return ''
-    
-    # Escape pipe characters in cell content
-    def escape_cell(cell):
-        return str(cell).replace('|', '\\|').replace('\n', ' ')
+        return
     
     # Header row
-    header = table_rows[0] if table_rows else []
+    header = table_rows[0]
     while len(header) < num_cols:
         header.append('')
-    result.append('| ' + ' | '.join(escape_cell(cell) for cell in header) + ' |')
-    result.append('| ' + ' | '.join(['---'] * num_cols) + ' |')
+    buf.write('| ' + ' | '.join([escape_cell(cell) for cell in header]) + ' |\n')
+    buf.write('| ' + ' | '.join(['---'] * num_cols) + ' |\n')
     
     # Data rows
     for row in table_rows[1:]:
         # Pad row if needed
         while len(row) < num_cols:
             row.append('')
-        result.append('| ' + ' | '.join(escape_cell(cell) for cell in row) + ' |')
+        buf.write('| ' + ' | '.join([escape_cell(cell) for cell in row]) + ' |\n')
     
-    return '\n'.join(result) + '\n\n'
+    buf.write('\n')
 
 
-def get_all_tabs(doc: Dict) -> List[Tuple[str, Dict]]:
+def write_content_to_markdown(content: List[Dict], buf: TextIO):
+    """Convert a list of structural elements (paragraphs, tables, breaks) to markdown."""
+    for element in content:
+        if 'paragraph' in element:
+            convert_paragraph_to_markdown(element, buf)
+        elif 'table' in element:
+            convert_table_to_markdown(element, buf)
+        elif 'sectionBreak' in element:
+            buf.write('\n---\n\n')
+
+
+def get_all_tabs(doc: Dict) -> Iterator[Tuple[str, Dict]]:
     """
-    Recursively get all tabs from a document, including nested child tabs.
-    Returns a list of tuples: (tab_title, tab_content_dict)
+    Get all tabs from a document, including nested child tabs (depth-first, in document order).
+    Yields tuples: (tab_title, tab_content_dict)
     """
-    all_tabs = []
-    
-    # Get tabs from document
-    tabs = doc.get('tabs', [])
+    pending = deque(doc.get('tabs', []))
     
-    for tab in tabs:
+    while pending:
+        tab = pending.popleft()
+        
         # Get tab title
         tab_props = tab.get('tabProperties', {})
         tab_title = tab_props.get('title', 'Untitled Tab')
         
-        # Add this tab
+        # Yield this tab
         if 'documentTab' in tab:
-            all_tabs.append((tab_title, tab['documentTab']))
+            yield tab_title, tab['documentTab']
         
-        # Recursively get child tabs
-        if 'childTabs' in tab:
-            for child_tab in tab['childTabs']:
-                child_props = child_tab.get('tabProperties', {})
-                child_title = child_props.get('title', 'Untitled Tab')
-                if 'documentTab' in child_tab:
-                    all_tabs.append((child_title, child_tab['documentTab']))
-                # Handle nested child tabs
-                if 'childTabs' in child_tab:
-                    nested_tabs = get_all_tabs({'tabs': child_tab['childTabs']})
-                    all_tabs.extend(nested_tabs)
+        # Visit child tabs next, before this tab's siblings
+        pending.extendleft(reversed(tab.get('childTabs', [])))
+
+
+def iter_document_content(doc: Dict) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    Yield (title, content) for the main body and each tab that has content.
+    """
+    # Main body content (if any)
+    main_content = doc.get('body', {}).get('content', [])
+    if main_content:
+        yield 'Main Document', main_content
+    
+    # Content from each tab (if document has tabs)
+    for tab_title, tab_doc in get_all_tabs(doc):
+        tab_content = tab_doc.get('body', {}).get('content', [])
+        if tab_content:
+            yield tab_title, tab_content
+
+
+def convert_document_to_stream(doc: Dict, fp: TextIO):
+    """
+    Convert a Google Document to a single markdown file, writing it directly to fp.
+    
+    Content from all tabs is combined, with a heading per tab when there are several.
+    """
+    all_content = list(iter_document_content(doc)) or [('Main Document', [])]
+    for tab_title, content in all_content:
+        if len(all_content) > 1:
+            fp.write(f'\n# {tab_title}\n\n')
+        
+        write_content_to_markdown(content, fp)
+
+
+def write_document_to_file(doc: Dict, output_file: Path):
+    """
+    Convert a Google Document into a single markdown file at output_file.
     
-    return all_tabs
+    The markdown is streamed into a temp file next to output_file and moved into
+    place once complete, so a failed conversion leaves any previous export intact.
+    """
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            convert_document_to_stream(doc, f)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
 
 
 def convert_document_to_markdown(doc: Dict, split_by_sections: bool = False, split_by_tabs: bool = False) -> List[Tuple[str, str]]:
@@ -264,47 +377,14 @@ def convert_document_to_markdown(doc: Dict, split_by_sections: bool = False, spl
         If split_by_sections is True: List of tuples (section_title, markdown) for each section
         If split_by_tabs is True: List of tuples (tab_title, markdown) for each tab
     """
-    result = []
-    
-    # Get all tabs content (if document has tabs)
-    all_tabs = get_all_tabs(doc)
-    
-    # Collect content from main body and all tabs
-    all_content = []
-    
-    # Add main body content (if any)
-    main_body = doc.get('body', {})
-    main_content = main_body.get('content', [])
-    if main_content:
-        all_content.append(('Main Document', main_content))
-    
-    # Add content from each tab
-    for tab_title, tab_doc in all_tabs:
-        tab_body = tab_doc.get('body', {})
-        tab_content = tab_body.get('content', [])
-        if tab_content:
-            all_content.append((tab_title, tab_content))
-    
-    # If no tabs and no main content, use empty content
-    if not all_content:
-        all_content = [('Main Document', main_body.get('content', []))]
-    
     if split_by_tabs:
         # Split by tabs mode - one file per tab
         tab_sections = []
-        for tab_title, content in all_content:
-            markdown_parts = []
-            for element in content:
-                if 'paragraph' in element:
-                    markdown = convert_paragraph_to_markdown(element)
-                    markdown_parts.append(markdown)
-                elif 'table' in element:
-                    markdown = convert_table_to_markdown(element)
-                    markdown_parts.append(markdown)
-                elif 'sectionBreak' in element:
-                    markdown_parts.append('\n---\n\n')
+        for tab_title, content in iter_document_content(doc):
+            buf = io.StringIO()
+            write_content_to_markdown(content, buf)
             
-            tab_markdown = ''.join(markdown_parts)
+            tab_markdown = buf.getvalue()
             if tab_markdown.strip():  # Only add non-empty tabs
                 tab_sections.append((tab_title, tab_markdown))
         
@@ -312,42 +392,31 @@ def convert_document_to_markdown(doc: Dict, split_by_sections: bool = False, spl
     
     if not split_by_sections:
         # Single file mode - combine everything from all tabs
-        markdown_parts = []
-        for tab_title, content in all_content:
-            if len(all_content) > 1:
-                markdown_parts.append(f'\n# {tab_title}\n\n')
-            
-            for element in content:
-                if 'paragraph' in element:
-                    markdown = convert_paragraph_to_markdown(element)
-                    markdown_parts.append(markdown)
-                elif 'table' in element:
-                    markdown = convert_table_to_markdown(element)
-                    markdown_parts.append(markdown)
-                elif 'sectionBreak' in element:
-                    markdown_parts.append('\n---\n\n')
-        
-        return [('', ''.join(markdown_parts))]
+        buf = io.StringIO()
+        convert_document_to_stream(doc, buf)
+        return [('', buf.getvalue())]
     
     else:
+        # Sections need the tab count up front, so collect content from main body and all tabs
+        # (if no tabs and no main content, use empty content)
+        all_content = list(iter_document_content(doc)) or [('Main Document', [])]
+        
         # Split by sections mode - detect major headings (H1) as section breaks
         sections = []
-        current_section = []
+        current_section = io.StringIO()
         current_section_title = None
         has_content_before_first_heading = False
         
-        # Process all content from all tabs
+        # Process all elements from all tabs
         for tab_title, content in all_content:
-            # Add tab title as a section if we have multiple tabs
+            # Each tab starts a new section (titled after the tab) if we have multiple tabs
             if len(all_content) > 1 and content:
-                if current_section:
+                if current_section.tell():
                     title = current_section_title or 'Introduction'
-                    sections.append((title, ''.join(current_section)))
+                    sections.append((title, current_section.getvalue()))
                 current_section_title = tab_title
-                current_section = []
-        
-        # Process all elements from all tabs
-        for tab_title, content in all_content:
+                current_section = io.StringIO()
+            
             for element in content:
                 if 'paragraph' in element:
                     para = element['paragraph']
@@ -357,10 +426,10 @@ def convert_document_to_markdown(doc: Dict, split_by_sections: bool = False, spl
                     # Check if this is a major heading (H1 only) that should start a new section
                     if named_style == 'HEADING_1':
                         # Save previous section if it has content
-                        if current_section:
+                        if current_section.tell():
                             # Use a default title if we haven't set one yet
                             title = current_section_title or 'Introduction'
-                            sections.append((title, ''.join(current_section)))
+                            sections.append((title, current_section.getvalue()))
                         
                         # Start new section
                         text_parts = []
@@ -371,47 +440,47 @@ def convert_document_to_markdown(doc: Dict, split_by_sections: bool = False, spl
                         # Clean up the title (remove markdown formatting)
                         raw_title = ''.join(text_parts).strip()
                         # Remove bold/italic markers
-                        current_section_title = re.sub(r'\*\*?([^*]+)\*\*?', r'\1', raw_title).strip() or 'Untitled Section'
-                        current_section = []
+                        current_section_title = _EMPHASIS_PATTERN.sub(r'\1', raw_title).strip() or 'Untitled Section'
+                        current_section = io.StringIO()
                         # Add the heading to the new section
-                        markdown = convert_paragraph_to_markdown(element)
-                        current_section.append(markdown)
+                        convert_paragraph_to_markdown(element, current_section)
                         has_content_before_first_heading = True
                     else:
-                        markdown = convert_paragraph_to_markdown(element)
-                        current_section.append(markdown)
+                        convert_paragraph_to_markdown(element, current_section)
                         if not has_content_before_first_heading and current_section_title is None:
                             # We have content before the first H1
                             current_section_title = 'Introduction'
                         
                 elif 'table' in element:
-                    markdown = convert_table_to_markdown(element)
-                    current_section.append(markdown)
+                    convert_table_to_markdown(element, current_section)
                 elif 'sectionBreak' in element:
                     # Section breaks can also indicate a new section
                     # Save current section if it has content
-                    if current_section:
+                    if current_section.tell():
                         title = current_section_title or 'Untitled Section'
-                        sections.append((title, ''.join(current_section)))
+                        sections.append((title, current_section.getvalue()))
                     current_section_title = 'Untitled Section'
-                    current_section = []
+                    current_section = io.StringIO()
         
         # Add final section
-        if current_section:
+        if current_section.tell():
             title = current_section_title or 'Untitled Section'
-            sections.append((title, ''.join(current_section)))
+            sections.append((title, current_section.getvalue()))
         
         return sections if sections else [('Introduction', '')]
 
 
 def sanitize_filename(title: str) -> str:
     """Convert document title to a valid filename."""
+    # Fast path: ASCII titles that are already lowercase and separator-clean
+    if (title.isascii() and title.islower() and '--' not in title
+            and title.translate(_UNSAFE_FILENAME_CHARS) == title):
+        return title if title.endswith('.md') else title + '.md'
+    
     # Remove invalid characters
-    filename = re.sub(r'[<>:"/\\|?*]', '', title)
-    # Replace spaces with hyphens
-    filename = re.sub(r'\s+', '-', filename)
-    # Remove multiple hyphens
-    filename = re.sub(r'-+', '-', filename)
+    filename = title.translate(_INVALID_FILENAME_CHARS)
+    # Replace spaces with hyphens, collapsing multiple hyphens
+    filename = _SEPARATOR_PATTERN.sub('-', filename)
     # Convert to lowercase
     filename = filename.lower()
     # Add .md extension if not present
@@ -453,24 +522,25 @@ def main():
     
     # Get credentials
     try:
-        creds = get_credentials()
+        creds = get_credentials(tuple(SCOPES), TOKEN_FILE)
     except Exception as e:
         print(f"Error getting credentials: {e}", file=sys.stderr)
         sys.exit(1)
     
     # Build service
     try:
-        service = build('docs', 'v1', credentials=creds)
+        service = build_service('docs', 'v1', creds)
     except Exception as e:
         print(f"Error building service: {e}", file=sys.stderr)
         sys.exit(1)
     
     # Get document - request all content including tabs
     try:
-        # Request the full document with all tabs content
+        # Request the document with all tabs content (only the fields we convert)
         doc = service.documents().get(
             documentId=args.doc_id,
-            includeTabsContent=True
+            includeTabsContent=True,
+            fields=DOCUMENT_FIELDS
         ).execute()
     except HttpError as e:
         if e.resp.status == 404:
@@ -488,10 +558,10 @@ def main():
     title = doc.get('title', 'Untitled Document')
     print(f"Document: {title}", file=sys.stderr)
     
-    # Convert to markdown (returns list of sections)
-    sections = convert_document_to_markdown(doc, split_by_sections=args.split_sections, split_by_tabs=args.split_tabs)
-    
     if args.split_tabs:
+        # Convert to markdown (one section per tab)
+        sections = convert_document_to_markdown(doc, split_by_tabs=True)
+        
         # Write each tab to a separate file in a folder
         if args.output:
             # If output is specified, use it as the folder name
@@ -538,6 +608,9 @@ def main():
                 print(f"Error writing file {output_file}: {e}", file=sys.stderr)
     
     elif args.split_sections:
+        # Convert to markdown (one section per H1)
+        sections = convert_document_to_markdown(doc, split_by_sections=True)
+        
         # Write each section to a separate file
         base_path = Path(args.output).parent if args.output else Path('.')
         base_name = Path(args.output).stem if args.output else sanitize_filename(title).replace('.md', '')
@@ -568,8 +641,6 @@ def main():
                 print(f"Error writing file {output_file}: {e}", file=sys.stderr)
     else:
         # Single file mode
-        _, markdown = sections[0]
-        
         # Determine output file
         if args.output:
             output_file = Path(args.output)
@@ -581,11 +652,9 @@ def main():
             print(f"Error: File {output_file} already exists. Use --force to overwrite.", file=sys.stderr)
             sys.exit(1)
         
-        # Write to file
+        # Convert straight into the file
         try:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(markdown)
+            write_document_to_file(doc, output_file)
             print(f"Exported to: {output_file.absolute()}", file=sys.stderr)
         except Exception as e:
             print(f"Error writing file: {e}", file=sys.stderr)
@@ -10,34 +10,156 @@ Supports updating existing docs by storing the doc ID in the markdown file:
 """
 
 import argparse
+import functools
+import hashlib
 import os
+import random
 import re
+import shutil
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import accumulate
 from pathlib import Path
 
 # Google API imports
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, build_http
 
 # Pattern to find Google Doc ID in markdown
 DOC_ID_PATTERN = re.compile(r'<!--\s*google-doc-id:\s*([a-zA-Z0-9_-]+)\s*-->')
 
+# Pattern for a non-blank, non-list line directly followed by a list item line
+# (-, *, +, or 1.), which needs a blank line inserted between the two
+LIST_AFTER_TEXT_PATTERN = re.compile(
+    r'^(?![-*+][^\S\n]|\d+\.[^\S\n])([^\S\n]*\S[^\n]*)\n(?=[-*+][^\S\n]|\d+\.[^\S\n])',
+    re.MULTILINE
+)
+
 # Default reference template (for consistent styling)
 SCRIPT_DIR = Path(__file__).parent
 DEFAULT_REFERENCE_DOC = SCRIPT_DIR / 'reference-template.docx'
 
+# Optional cache of pandoc output, enabled with GDOCS_UPLOAD_CACHE=1.
+# Entries are keyed by content hash; least recently used ones are evicted past the size cap.
+CACHE_DIR = Path(os.path.expanduser('~/.cache/gdocs-upload'))
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# documents.get field masks - request only what each step reads.
+# Cell paragraphs keep paragraphStyle/namedStyleType so 'paragraph' stays present.
+_CELL_PARAGRAPHS = 'content(startIndex,endIndex,paragraph/paragraphStyle/namedStyleType)'
+_TEXT_RUNS = 'elements/textRun(content,textStyle)'
+STYLE_FIELDS = (
+    'body/content(startIndex,endIndex,'
+    'paragraph(paragraphStyle/namedStyleType,bullet/listId),'
+    f'table(rows,columns,tableRows/tableCells/{_CELL_PARAGRAPHS}))'
+)
+SOURCE_FIELDS = (
+    'body/content('
+    f'paragraph(paragraphStyle/namedStyleType,bullet(listId,nestingLevel),{_TEXT_RUNS}),'
+    f'table(rows,columns,tableRows/tableCells/content/paragraph/{_TEXT_RUNS})),'
+    'lists'
+)
+END_INDEX_FIELDS = 'body/content/endIndex'
+# batchUpdate replies are never read, so only ask for the document ID back
+BATCH_UPDATE_FIELDS = 'documentId'
+
+# Docs API limit on requests per batchUpdate
+MAX_BATCH_REQUESTS = 500
+
+# On/off text styles copied into table cells, in the order their fields are listed
+CELL_STYLE_KEYS = ('bold', 'italic', 'underline')
+
+# Table cell text is set to this size to override any inherited styles
+CELL_FONT_SIZE = {'magnitude': 11, 'unit': 'PT'}
+
+# Retry rate limit (429) and transient server errors with exponential backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A server error can come back after a batchUpdate was applied, so batches that
+# insert or delete content - which would then be applied twice - only retry 429
+CONTENT_RETRY_STATUSES = (429,)
+MAX_TRIES = 6
+MAX_BACKOFF = 64
+
+# Docs API write quota is 60 requests per minute per user
+DOCS_WRITES_PER_MINUTE = 60
+DOCS_WRITE_BURST = 10
+
+# Files up to this size are sent in a single request; larger ones use a
+# resumable upload in chunks of RESUMABLE_CHUNK_BYTES (a multiple of 256KB)
+SIMPLE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+RESUMABLE_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Drive appProperties key holding the hash of the markdown a doc was built from
+CONTENT_HASH_PROPERTY = 'mdHash'
+
+# Everything an in-place update reads about the existing doc, fetched in one call
+EXISTING_DOC_FIELDS = 'id, appProperties, parents, webViewLink'
+
+# Default number of files uploaded at once with --parallel
+DEFAULT_PARALLEL = 4
+
 SCOPES = [
     'https://www.googleapis.com/auth/drive.file',
     'https://www.googleapis.com/auth/documents'
 ]
 
+# Credentials are shared by all upload threads; the lock ensures only one
+# thread loads, refreshes, or runs the OAuth flow
+_credentials = None
+_credentials_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket shared across threads to stay under a per-minute request quota."""
+
+    def __init__(self, per_minute: int, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+docs_write_limiter = RateLimiter(DOCS_WRITES_PER_MINUTE, DOCS_WRITE_BURST)
+
+# googleapiclient service objects are not thread-safe, so each upload thread
+# builds and keeps its own
+_thread_local = threading.local()
+
+
 def get_credentials():
-    """Get Google API credentials via OAuth."""
+    """Get Google API credentials via OAuth (cached for the process, thread-safe)."""
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None or not _credentials.valid:
+            _credentials = load_credentials()
+        return _credentials
+
+
+def load_credentials():
+    """Load, refresh, or create Google API credentials."""
     # Use separate token file for this skill (needs drive.file scope)
     token_file = os.environ.get('GOOGLE_DRIVE_TOKEN_FILE',
                                 os.path.expanduser('~/.google-drive-upload-token.json'))
@@ -49,10 +171,12 @@ def get_credentials():
         sys.exit(1)
 
     creds = None
+    saved_token = None
 
     # Load existing token
     if os.path.exists(token_file):
         creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+        saved_token = creds.to_json()
 
     # Refresh or get new token
     if not creds or not creds.valid:
@@ -62,20 +186,54 @@ def get_credentials():
             flow = InstalledAppFlow.from_client_secrets_file(client_secret_file, SCOPES)
             creds = flow.run_local_server(port=0)
 
-        # Save token
-        with open(token_file, 'w') as f:
-            f.write(creds.to_json())
+    # Save token only if it changed
+    token = creds.to_json()
+    if token != saved_token:
+        save_token(token_file, token)
 
     return creds
 
 
+def save_token(token_file: str, token: str):
+    """Write the OAuth token atomically, readable only by the current user."""
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(token_file)),
+                                     prefix='.token-', delete=False) as tmp:
+        tmp.write(token)
+    try:
+        os.chmod(tmp.name, 0o600)
+        os.replace(tmp.name, token_file)
+    except OSError:
+        os.remove(tmp.name)
+        raise
+
+
+def get_service(api: str, version: str):
+    """Get this thread's API client for (api, version), building it on first use.
+
+    Uses the discovery document bundled with google-api-python-client, so
+    building never fetches it over the network. A thread's clients share one
+    authorized connection pool (httplib2 isn't thread-safe, so pools aren't
+    shared across threads), keeping connections alive between calls.
+    """
+    services = getattr(_thread_local, 'services', None)
+    if services is None:
+        services = _thread_local.services = {}
+        _thread_local.http = AuthorizedHttp(get_credentials(), http=build_http())
+    if (api, version) not in services:
+        services[(api, version)] = build(api, version, http=_thread_local.http,
+                                         cache_discovery=False, static_discovery=True)
+    return services[(api, version)]
+
+
 def extract_doc_id(content: str) -> tuple[str, str]:
     """Extract Google Doc ID from markdown content and return (doc_id, clean_content)."""
     match = DOC_ID_PATTERN.search(content)
     if match:
         doc_id = match.group(1)
-        # Remove the comment line from content
-        clean_content = DOC_ID_PATTERN.sub('', content).lstrip('\n')
+        # Remove the comment line from content. Nothing before the match can
+        # be another comment, so only the text after it is searched again
+        clean_content = (content[:match.start()]
+                         + DOC_ID_PATTERN.sub('', content[match.end():])).lstrip('\n')
         return doc_id, clean_content
     return None, content
 
@@ -85,11 +243,9 @@ def save_doc_id_to_markdown(markdown_path: str, doc_id: str):
     with open(markdown_path, 'r') as f:
         content = f.read()
 
-    # Check if already has a doc ID
-    if DOC_ID_PATTERN.search(content):
-        # Replace existing
-        content = DOC_ID_PATTERN.sub(f'<!-- google-doc-id: {doc_id} -->', content)
-    else:
+    # Replace an existing doc ID, in the same scan that looks for it
+    content, replaced = DOC_ID_PATTERN.subn(f'<!-- google-doc-id: {doc_id} -->', content)
+    if not replaced:
         # Add to top
         content = f'<!-- google-doc-id: {doc_id} -->\n\n{content}'
 
@@ -97,6 +253,7 @@ def save_doc_id_to_markdown(markdown_path: str, doc_id: str):
         f.write(content)
 
 
+@functools.lru_cache(maxsize=64)
 def preprocess_markdown_for_lists(content: str) -> str:
     """Ensure blank lines before list items that follow paragraphs.
 
@@ -104,73 +261,189 @@ def preprocess_markdown_for_lists(content: str) -> str:
     Without this, bullets immediately after a paragraph line get merged
     into that paragraph as inline text instead of becoming list items.
     """
-    lines = content.split('\n')
-    result = []
-    for i, line in enumerate(lines):
-        # Check if this line starts a list item (-, *, +, or 1.)
-        if re.match(r'^[\-\*\+]\s', line) or re.match(r'^\d+\.\s', line):
-            # Insert blank line if previous line is non-empty, non-blank,
-            # and not itself a list item
-            if result and result[-1].strip() and not re.match(r'^[\-\*\+]\s', result[-1]) and not re.match(r'^\d+\.\s', result[-1]):
-                result.append('')
-        result.append(line)
-    return '\n'.join(result)
+    return LIST_AFTER_TEXT_PATTERN.sub(r'\1\n\n', content)
+
+
+def pandoc_cache_key(markdown: str, options: list, reference_doc: str = None) -> str:
+    """Hash everything that affects pandoc's output: input, options, reference doc, and pandoc itself."""
+    pandoc = shutil.which('pandoc')
+    if not pandoc:
+        return None
+    # Identify the pandoc build by its resolved path and stat, rather than
+    # spawning `pandoc --version` (which would cost as much as a conversion)
+    pandoc = os.path.realpath(pandoc)
+    stat = os.stat(pandoc)
+
+    key = hashlib.blake2b(digest_size=20)
+    key.update(f'{pandoc}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode())
+    key.update('\0'.join(options).encode() + b'\0')
+    if reference_doc:
+        key.update(Path(reference_doc).read_bytes())
+    key.update(b'\0' + markdown.encode('utf-8'))
+    return key.hexdigest()
+
+
+def store_in_cache(docx_path: str, cache_file: Path):
+    """Copy a converted docx into the cache atomically, then evict old entries."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=CACHE_DIR)
+        os.close(fd)
+        try:
+            shutil.copyfile(docx_path, tmp_path)
+            os.replace(tmp_path, cache_file)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+
+        # Evict least recently used entries (hits refresh the mtime) past the size cap
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                         for entry in os.scandir(CACHE_DIR) if entry.name.endswith('.docx'))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= CACHE_MAX_BYTES:
+                break
+            os.remove(path)
+            total -= size
+    except OSError as e:
+        # The cache is only an optimization
+        print(f"Warning: Could not update pandoc cache: {e}")
 
 
 def convert_markdown_to_docx(markdown_path: str, docx_path: str, reference_doc: str = None, content_override: str = None):
     """Convert markdown to docx using pandoc."""
 
-    # If we have cleaned content (with doc ID stripped), use temp file
+    # Use cleaned content (with doc ID stripped) if we have it
     if content_override:
-        content_override = preprocess_markdown_for_lists(content_override)
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as tmp:
-            tmp.write(content_override)
-            markdown_path = tmp.name
+        preprocessed = preprocess_markdown_for_lists(content_override)
     else:
         # Preprocess the file content even when no content_override
         with open(markdown_path, 'r') as f:
-            raw = f.read()
-        preprocessed = preprocess_markdown_for_lists(raw)
-        if preprocessed != raw:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as tmp:
-                tmp.write(preprocessed)
-                markdown_path = tmp.name
+            preprocessed = preprocess_markdown_for_lists(f.read())
 
-    cmd = ['pandoc', markdown_path, '-o', docx_path]
+    options = []
 
     # Use reference doc for styling if provided
     if reference_doc and os.path.exists(reference_doc):
-        cmd.extend(['--reference-doc', reference_doc])
+        options.extend(['--reference-doc', reference_doc])
+    else:
+        reference_doc = None
 
     # Add options for better formatting
     # -auto_identifiers removes bookmarks/anchors from headings
-    cmd.extend([
+    options.extend([
         '--from', 'markdown+pipe_tables+backtick_code_blocks-auto_identifiers',
         '--wrap', 'none',
     ])
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    # Reuse a previous conversion of identical content
+    cache_file = None
+    if os.environ.get('GDOCS_UPLOAD_CACHE') == '1':
+        key = pandoc_cache_key(preprocessed, options, reference_doc)
+        if key:
+            cache_file = CACHE_DIR / f'{key}.docx'
+            try:
+                shutil.copyfile(cache_file, docx_path)
+                os.utime(cache_file)
+                return docx_path
+            except OSError:
+                pass
+
+    # Pipe the preprocessed markdown to pandoc on stdin (no temp file)
+    cmd = ['pandoc', '-', '-o', docx_path] + options
+
+    result = subprocess.run(cmd, input=preprocessed, capture_output=True, text=True, encoding='utf-8')
 
     if result.returncode != 0:
         print(f"Pandoc error: {result.stderr}")
         sys.exit(1)
 
+    if cache_file:
+        store_in_cache(docx_path, cache_file)
+
     return docx_path
 
 
+def retry_after_seconds(error: HttpError) -> int:
+    """Get the server's requested wait from a Retry-After header (0 if absent)."""
+    try:
+        return int(error.resp.get('retry-after') or 0)
+    except ValueError:
+        # HTTP-date form - fall back to exponential backoff
+        return 0
+
+
+def execute_with_backoff(request, retry_statuses: tuple = RETRY_STATUSES):
+    """Execute a Docs write request, retrying retry_statuses with exponential backoff.
+
+    Each attempt waits for the shared write limiter. Retries wait at least as long
+    as the server's Retry-After header asks, with jitter so parallel uploads
+    don't retry in lockstep. Pass CONTENT_RETRY_STATUSES for requests that
+    aren't safe to apply twice.
+    """
+    for attempt in range(MAX_TRIES):
+        docs_write_limiter.acquire()
+        try:
+            return request.execute()
+        except HttpError as e:
+            if e.resp.status not in retry_statuses or attempt == MAX_TRIES - 1:
+                raise
+            delay = max(retry_after_seconds(e), min(MAX_BACKOFF, 2 ** attempt)) + random.uniform(0, 1)
+            print(f"  API error {e.resp.status}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def batch_update(docs_service, doc_id: str, requests: list, on_error=None,
+                 retry_statuses: tuple = RETRY_STATUSES):
+    """Apply requests to a document in order, in as few batchUpdate calls as possible.
+
+    The write rate limit counts calls, not the requests inside them, so the
+    list is only split where it exceeds MAX_BATCH_REQUESTS. Each call is
+    atomic, so without on_error a failed call raises. With on_error, a call
+    rejected as invalid is split in half and retried until only the requests
+    at fault are left; those, and calls that failed for any other reason, are
+    passed to on_error(batch, error) while the remaining requests still go out.
+    """
+    for i in range(0, len(requests), MAX_BATCH_REQUESTS):
+        send_batch(docs_service, doc_id, requests[i:i+MAX_BATCH_REQUESTS], on_error, retry_statuses)
+
+
+def send_batch(docs_service, doc_id: str, batch: list, on_error, retry_statuses: tuple):
+    """Send one batchUpdate call, narrowing down rejected requests (see batch_update)."""
+    try:
+        execute_with_backoff(docs_service.documents().batchUpdate(
+            documentId=doc_id,
+            fields=BATCH_UPDATE_FIELDS,
+            body={'requests': batch}
+        ), retry_statuses)
+    except Exception as e:
+        if on_error is None:
+            raise
+        if isinstance(e, HttpError) and e.resp.status == 400 and len(batch) > 1:
+            # Nothing in a rejected call was applied, so its halves can be sent in turn
+            middle = len(batch) // 2
+            send_batch(docs_service, doc_id, batch[:middle], on_error, retry_statuses)
+            send_batch(docs_service, doc_id, batch[middle:], on_error, retry_statuses)
+        else:
+            on_error(batch, e)
+
+
 def apply_document_styles(doc_id: str, heading_font: str = 'Proxima Nova'):
     """Apply custom styles to document via Google Docs API."""
-    import time
-
-    creds = get_credentials()
-    docs_service = build('docs', 'v1', credentials=creds)
+    docs_service = get_service('docs', 'v1')
 
     # Get the document structure
-    doc = docs_service.documents().get(documentId=doc_id).execute()
+    doc = docs_service.documents().get(documentId=doc_id, fields=STYLE_FIELDS).execute()
 
     requests = []
     table_count = 0
-    list_item_count = 0
+    heading_count = 0
+    paragraph_count = 0
+
+    # Adjacent paragraphs sharing a style are covered by one request:
+    # [start, end] ranges for heading fonts, [start, end, is_list_item] for spacing
+    heading_runs = []
+    spacing_runs = []
 
     # 0.5pt border style with dark gray 1 color (#b7b7b7)
     border_style = {
@@ -210,49 +483,24 @@ def apply_document_styles(doc_id: str, heading_font: str = 'Proxima Nova'):
             if style.startswith('HEADING_'):
                 # Skip empty ranges
                 if end_index - 1 > start_index:
-                    requests.append({
-                        'updateTextStyle': {
-                            'range': {
-                                'startIndex': start_index,
-                                'endIndex': end_index - 1
-                            },
-                            'textStyle': {
-                                'weightedFontFamily': {
-                                    'fontFamily': heading_font,
-                                    'weight': 700
-                                }
-                            },
-                            'fields': 'weightedFontFamily'
-                        }
-                    })
+                    heading_count += 1
+                    # Extend the previous heading's range when this heading
+                    # directly follows it (covering the newline between them)
+                    if heading_runs and heading_runs[-1][1] + 1 == start_index:
+                        heading_runs[-1][1] = end_index - 1
+                    else:
+                        heading_runs.append([start_index, end_index - 1])
 
             # Add space after all paragraphs (including list items)
             # Skip empty paragraphs
             if end_index > start_index:
-                list_item_count += 1
+                paragraph_count += 1
                 is_list_item = 'bullet' in para
-                style_update = {
-                    'spaceBelow': {
-                        'magnitude': 8 if is_list_item else 6,
-                        'unit': 'PT'
-                    }
-                }
-                fields = 'spaceBelow'
-                # List items need NEVER_COLLAPSE or Google Docs
-                # suppresses spacing between consecutive list items
-                if is_list_item:
-                    style_update['spacingMode'] = 'NEVER_COLLAPSE'
-                    fields = 'spaceBelow,spacingMode'
-                requests.append({
-                    'updateParagraphStyle': {
-                        'range': {
-                            'startIndex': start_index,
-                            'endIndex': end_index
-                        },
-                        'paragraphStyle': style_update,
-                        'fields': fields
-                    }
-                })
+                if (spacing_runs and spacing_runs[-1][1] == start_index
+                        and spacing_runs[-1][2] == is_list_item):
+                    spacing_runs[-1][1] = end_index
+                else:
+                    spacing_runs.append([start_index, end_index, is_list_item])
 
         # Handle tables
         if 'table' in element:
@@ -329,43 +577,60 @@ def apply_document_styles(doc_id: str, heading_font: str = 'Proxima Nova'):
                                     }
                                 })
 
-    if requests:
-        # Batch requests in groups of 30 to avoid rate limits (60/min limit)
-        batch_size = 30
-        for i in range(0, len(requests), batch_size):
-            batch = requests[i:i+batch_size]
-            try:
-                docs_service.documents().batchUpdate(
-                    documentId=doc_id,
-                    body={'requests': batch}
-                ).execute()
-            except Exception as e:
-                if 'Quota exceeded' in str(e) or '429' in str(e):
-                    print(f"  Rate limit hit, waiting 60s...")
-                    time.sleep(60)
-                    # Retry
-                    docs_service.documents().batchUpdate(
-                        documentId=doc_id,
-                        body={'requests': batch}
-                    ).execute()
-                else:
-                    raise
+    for start_index, end_index in heading_runs:
+        requests.append({
+            'updateTextStyle': {
+                'range': {
+                    'startIndex': start_index,
+                    'endIndex': end_index
+                },
+                'textStyle': {
+                    'weightedFontFamily': {
+                        'fontFamily': heading_font,
+                        'weight': 700
+                    }
+                },
+                'fields': 'weightedFontFamily'
+            }
+        })
+
+    for start_index, end_index, is_list_item in spacing_runs:
+        style_update = {
+            'spaceBelow': {
+                'magnitude': 8 if is_list_item else 6,
+                'unit': 'PT'
+            }
+        }
+        fields = 'spaceBelow'
+        # List items need NEVER_COLLAPSE or Google Docs
+        # suppresses spacing between consecutive list items
+        if is_list_item:
+            style_update['spacingMode'] = 'NEVER_COLLAPSE'
+            fields = 'spaceBelow,spacingMode'
+        requests.append({
+            'updateParagraphStyle': {
+                'range': {
+                    'startIndex': start_index,
+                    'endIndex': end_index
+                },
+                'paragraphStyle': style_update,
+                'fields': fields
+            }
+        })
 
-            # Small delay between batches to avoid hitting rate limit
-            if i + batch_size < len(requests):
-                time.sleep(1.5)
+    if requests:
+        batch_update(docs_service, doc_id, requests)
 
-        heading_count = sum(1 for r in requests if 'updateTextStyle' in r and 'weightedFontFamily' in r.get('updateTextStyle', {}).get('textStyle', {}))
         print(f"  Applied {heading_font} font to {heading_count} headings")
         if table_count:
             print(f"  Applied borders, header styling, and vertical alignment to {table_count} tables")
-        if list_item_count:
-            print(f"  Added spacing after {list_item_count} paragraphs")
+        if paragraph_count:
+            print(f"  Added spacing after {paragraph_count} paragraphs")
 
 
 def clear_document_content(docs_service, doc_id: str):
     """Clear all content from a Google Doc, leaving it empty."""
-    doc = docs_service.documents().get(documentId=doc_id).execute()
+    doc = docs_service.documents().get(documentId=doc_id, fields=END_INDEX_FIELDS).execute()
 
     # Find the end index of the document body
     body = doc.get('body', {})
@@ -377,44 +642,42 @@ def clear_document_content(docs_service, doc_id: str):
     # The last element's endIndex - 1 is where content ends (excluding final newline)
     end_index = content[-1].get('endIndex', 1) - 1
 
+    requests = []
     if end_index > 1:
         # Delete from index 1 to end (index 0 is reserved, can't delete)
-        docs_service.documents().batchUpdate(
-            documentId=doc_id,
-            body={
-                'requests': [{
-                    'deleteContentRange': {
-                        'range': {
-                            'startIndex': 1,
-                            'endIndex': end_index
-                        }
-                    }
-                }]
+        requests.append({
+            'deleteContentRange': {
+                'range': {
+                    'startIndex': 1,
+                    'endIndex': end_index
+                }
             }
-        ).execute()
+        })
 
     # Remove any orphaned list definitions from the remaining empty paragraph.
     # Without this, re-uploaded content can inherit bullet formatting from the
     # previous version of the document.
-    docs_service.documents().batchUpdate(
-        documentId=doc_id,
-        body={
-            'requests': [{
-                'deleteParagraphBullets': {
-                    'range': {
-                        'startIndex': 1,
-                        'endIndex': 2
-                    }
-                }
-            }]
+    requests.append({
+        'deleteParagraphBullets': {
+            'range': {
+                'startIndex': 1,
+                'endIndex': 2
+            }
         }
-    ).execute()
+    })
+
+    # Requests in a batchUpdate apply in order, so both fit in one call
+    execute_with_backoff(docs_service.documents().batchUpdate(
+        documentId=doc_id,
+        fields=BATCH_UPDATE_FIELDS,
+        body={'requests': requests}
+    ), CONTENT_RETRY_STATUSES)
 
 
 def copy_document_content(docs_service, source_doc_id: str, dest_doc_id: str):
     """Copy all content from source doc to destination doc using Docs API."""
     # Get source document structure
-    source_doc = docs_service.documents().get(documentId=source_doc_id).execute()
+    source_doc = docs_service.documents().get(documentId=source_doc_id, fields=SOURCE_FIELDS).execute()
     source_body = source_doc.get('body', {}).get('content', [])
 
     if not source_body:
@@ -458,34 +721,90 @@ def copy_document_content(docs_service, source_doc_id: str, dest_doc_id: str):
             pass
 
     if requests:
-        docs_service.documents().batchUpdate(
+        execute_with_backoff(docs_service.documents().batchUpdate(
             documentId=dest_doc_id,
+            fields=BATCH_UPDATE_FIELDS,
             body={'requests': requests}
-        ).execute()
+        ), CONTENT_RETRY_STATUSES)
+
+
+def table_cell_starts(index: int, rows: int, cols: int) -> list[list[int]]:
+    """Get the paragraph start index of each cell of an empty table inserted at index.
 
+    insertTable adds a newline before the table, so the table starts at index + 1.
+    Each row then takes 1 index, and each empty cell 2 (the cell plus its newline).
+    """
+    first_cell = index + 4
+    row_size = 2 * cols + 1
+    return [[first_cell + row * row_size + 2 * col for col in range(cols)] for row in range(rows)]
+
+
+def extract_cell_runs(cell: dict) -> list:
+    """Get a table cell's [(text, text_style), ...] runs, without the cell's final newline."""
+    runs = [(text, elem['textRun'].get('textStyle', {}))
+            for content in cell.get('content', []) if 'paragraph' in content
+            for elem in content['paragraph'].get('elements', []) if 'textRun' in elem
+            if (text := elem['textRun'].get('content', ''))]
+    # A run never spans paragraphs, so the newline can only be its last character
+    if runs and runs[-1][0].endswith('\n'):
+        runs[-1] = (runs[-1][0][:-1], runs[-1][1])
+    return runs
+
+
+def text_style_request(start: int, end: int, text_style: dict, fields: str) -> dict:
+    """Build an updateTextStyle request for the [start, end) range."""
+    return {
+        'updateTextStyle': {
+            'range': {'startIndex': start, 'endIndex': end},
+            'textStyle': text_style,
+            'fields': fields
+        }
+    }
 
-def copy_doc_content_to_existing(docs_service, source_doc_id: str, dest_doc_id: str):
+
+def cell_text_style(text_style: dict, cache: dict):
+    """Get the (textStyle, fields) to copy for a table cell run, or None if it has none.
+
+    Only bold, italic, underline and links are carried over. A document uses a
+    handful of distinct combinations, so each is built once and kept in cache.
+    """
+    link = text_style.get('link')
+    if not (isinstance(link, dict) and ('url' in link or 'bookmarkId' in link or 'headingId' in link)):
+        link = None
+    key = tuple(bool(text_style.get(k)) for k in CELL_STYLE_KEYS) + (repr(link) if link else None,)
+    if key not in cache:
+        style_update = {k: True for k, on in zip(CELL_STYLE_KEYS, key) if on}
+        if link:
+            style_update['link'] = link
+        cache[key] = (style_update, ','.join(style_update)) if style_update else None
+    return cache[key]
+
+
+def copy_doc_content_to_existing(docs_service, source_doc_id: str, dest_doc_id: str) -> bool:
     """Copy content from source doc to destination, preserving formatting.
 
     Preserves: paragraph styles, text styles (bold, italic, underline), and tables.
-    Uses batched API calls to avoid rate limits.
+    Uses batched API calls to avoid rate limits. Returns False if some formatting
+    could not be applied (each failure is printed as a warning).
     """
-    import time
-
     # Get source document structure
-    source_doc = docs_service.documents().get(documentId=source_doc_id).execute()
+    source_doc = docs_service.documents().get(documentId=source_doc_id, fields=SOURCE_FIELDS).execute()
     source_body = source_doc.get('body', {}).get('content', [])
 
     if not source_body:
-        return
+        return True
 
     # Capture list definitions so we can distinguish numbered vs bulleted lists
     source_lists = source_doc.get('lists', {})
 
-    # Collect paragraphs with their text runs (preserving inline formatting info)
-    # Each paragraph: (named_style, [(text, text_style), ...])
-    paragraphs = []
-    table_info = []  # (position_in_paragraphs, table_element)
+    # Walk the source once, laying out the text to insert while building the
+    # style and bullet requests for it - each index is known as the text is placed
+    chunks = []
+    format_requests = []
+    bullet_requests = []
+    table_info = []  # (placeholder_index, table_element)
+    current_index = 1  # Start after index 0
+    last_text_style = None  # Most recent updateTextStyle, for merging adjacent runs
 
     for element in source_body:
         if 'paragraph' in element:
@@ -494,13 +813,17 @@ def copy_doc_content_to_existing(docs_service, source_doc_id: str, dest_doc_id:
             named_style = para_style.get('namedStyleType', 'NORMAL_TEXT')
             bullet = para.get('bullet')
 
+            # Text runs preserving inline formatting info: [(text, text_style), ...]
+            # with their total length, counted as they are collected
             text_runs = []
+            para_len = 0
 
             # For nested bullets, prepend tab characters to indicate nesting level
             if bullet:
                 nesting_level = bullet.get('nestingLevel', 0)
                 if nesting_level > 0:
                     text_runs.append(('\t' * nesting_level, {}))
+                    para_len = nesting_level
 
             for para_elem in para.get('elements', []):
                 if 'textRun' in para_elem:
@@ -508,181 +831,158 @@ def copy_doc_content_to_existing(docs_service, source_doc_id: str, dest_doc_id:
                     text_style = para_elem['textRun'].get('textStyle', {})
                     if text:
                         text_runs.append((text, text_style))
+                        para_len += len(text)
+
+            if not text_runs:
+                continue
+
+            para_start = current_index
+
+            # Apply paragraph style (headings)
+            if named_style and named_style != 'NORMAL_TEXT':
+                format_requests.append({
+                    'updateParagraphStyle': {
+                        'range': {'startIndex': para_start, 'endIndex': para_start + para_len},
+                        'paragraphStyle': {'namedStyleType': named_style},
+                        'fields': 'namedStyleType'
+                    }
+                })
 
-            if text_runs:
-                paragraphs.append((named_style, text_runs, bullet))
+            # Apply text styles (bold, italic, etc.) for each text run
+            for text, text_style in text_runs:
+                text_len = len(text)
+                if text_len > 0 and text_style:
+                    # Build the style update
+                    style_fields = []
+                    style_update = {}
+
+                    if text_style.get('bold'):
+                        style_update['bold'] = True
+                        style_fields.append('bold')
+
+                    if text_style.get('italic'):
+                        style_update['italic'] = True
+                        style_fields.append('italic')
+
+                    if text_style.get('underline'):
+                        style_update['underline'] = True
+                        style_fields.append('underline')
+
+                    if text_style.get('strikethrough'):
+                        style_update['strikethrough'] = True
+                        style_fields.append('strikethrough')
+
+                    # Handle font family
+                    if 'weightedFontFamily' in text_style:
+                        style_update['weightedFontFamily'] = text_style['weightedFontFamily']
+                        style_fields.append('weightedFontFamily')
+
+                    # Handle foreground color
+                    if 'foregroundColor' in text_style:
+                        style_update['foregroundColor'] = text_style['foregroundColor']
+                        style_fields.append('foregroundColor')
+
+                    # Handle background color
+                    if 'backgroundColor' in text_style:
+                        style_update['backgroundColor'] = text_style['backgroundColor']
+                        style_fields.append('backgroundColor')
+
+                    # Handle font size
+                    if 'fontSize' in text_style:
+                        style_update['fontSize'] = text_style['fontSize']
+                        style_fields.append('fontSize')
+
+                    # Handle links - ensure proper structure
+                    if 'link' in text_style:
+                        link_data = text_style['link']
+                        # Links can have url, bookmarkId, or headingId
+                        if isinstance(link_data, dict) and ('url' in link_data or 'bookmarkId' in link_data or 'headingId' in link_data):
+                            style_update['link'] = link_data
+                            style_fields.append('link')
+
+                    if style_fields and current_index + text_len - 1 > current_index:
+                        # Don't include trailing newline in text style range
+                        end_idx = current_index + text_len
+                        if text.endswith('\n'):
+                            end_idx -= 1
+
+                        if end_idx > current_index:
+                            fields = ','.join(style_fields)
+                            prev = last_text_style
+                            # Extend the previous run's request when this run directly
+                            # follows it with an identical style
+                            if (prev and prev['range']['endIndex'] == current_index
+                                    and prev['fields'] == fields and prev['textStyle'] == style_update):
+                                prev['range']['endIndex'] = end_idx
+                            else:
+                                format_requests.append(
+                                    text_style_request(current_index, end_idx, style_update, fields))
+                                last_text_style = format_requests[-1]['updateTextStyle']
+
+                chunks.append(text)
+                current_index += text_len
+
+            # Bullets are applied after all text insertion and paragraph styling
+            # (they follow the styles in the request stream) to avoid index conflicts.
+            if bullet:
+                # Determine if numbered or bulleted by checking source list properties
+                list_id = bullet.get('listId', '')
+                preset = 'BULLET_DISC_CIRCLE_SQUARE'  # default to unordered
+
+                if list_id and list_id in source_lists:
+                    list_props = source_lists[list_id]
+                    nesting_levels = list_props.get('listProperties', {}).get('nestingLevels', [])
+                    if nesting_levels:
+                        first_level = nesting_levels[0]
+                        glyph_type = first_level.get('glyphType', '')
+                        # Numbered list glyph types: DECIMAL, ALPHA, ROMAN, ZERO_DECIMAL, UPPER_ALPHA, UPPER_ROMAN
+                        if glyph_type in ('DECIMAL', 'ALPHA', 'ROMAN', 'ZERO_DECIMAL', 'UPPER_ALPHA', 'UPPER_ROMAN'):
+                            preset = 'NUMBERED_DECIMAL_ALPHA_ROMAN'
+
+                bullet_requests.append({
+                    'createParagraphBullets': {
+                        'range': {
+                            'startIndex': para_start,
+                            'endIndex': para_start + para_len
+                        },
+                        'bulletPreset': preset
+                    }
+                })
 
         elif 'table' in element:
-            table_info.append((len(paragraphs), element['table']))
             # Placeholder paragraph for table position
-            paragraphs.append(('NORMAL_TEXT', [('\n', {})], None))
+            table_info.append((current_index, element['table']))
+            chunks.append('\n')
+            current_index += 1
 
     # Step 1: Insert all text content in one batch
-    all_text = ''
-    for named_style, text_runs, bullet in paragraphs:
-        for text, style in text_runs:
-            all_text += text
+    all_text = ''.join(chunks)
 
     if all_text:
-        docs_service.documents().batchUpdate(
+        execute_with_backoff(docs_service.documents().batchUpdate(
             documentId=dest_doc_id,
+            fields=BATCH_UPDATE_FIELDS,
             body={'requests': [{
                 'insertText': {
                     'endOfSegmentLocation': {'segmentId': ''},
                     'text': all_text
                 }
             }]}
-        ).execute()
-
-    # Step 2: Apply paragraph styles AND text styles
-    format_requests = []
-    current_index = 1  # Start after index 0
-
-    for named_style, text_runs, bullet in paragraphs:
-        para_start = current_index
-        para_len = sum(len(text) for text, _ in text_runs)
-
-        # Apply paragraph style (headings)
-        if named_style and named_style != 'NORMAL_TEXT':
-            format_requests.append({
-                'updateParagraphStyle': {
-                    'range': {'startIndex': para_start, 'endIndex': para_start + para_len},
-                    'paragraphStyle': {'namedStyleType': named_style},
-                    'fields': 'namedStyleType'
-                }
-            })
+        ), CONTENT_RETRY_STATUSES)
 
-        # Apply text styles (bold, italic, etc.) for each text run
-        for text, text_style in text_runs:
-            text_len = len(text)
-            if text_len > 0 and text_style:
-                # Build the style update
-                style_fields = []
-                style_update = {}
-
-                if text_style.get('bold'):
-                    style_update['bold'] = True
-                    style_fields.append('bold')
-
-                if text_style.get('italic'):
-                    style_update['italic'] = True
-                    style_fields.append('italic')
-
-                if text_style.get('underline'):
-                    style_update['underline'] = True
-                    style_fields.append('underline')
-
-                if text_style.get('strikethrough'):
-                    style_update['strikethrough'] = True
-                    style_fields.append('strikethrough')
-
-                # Handle font family
-                if 'weightedFontFamily' in text_style:
-                    style_update['weightedFontFamily'] = text_style['weightedFontFamily']
-                    style_fields.append('weightedFontFamily')
-
-                # Handle foreground color
-                if 'foregroundColor' in text_style:
-                    style_update['foregroundColor'] = text_style['foregroundColor']
-                    style_fields.append('foregroundColor')
-
-                # Handle background color
-                if 'backgroundColor' in text_style:
-                    style_update['backgroundColor'] = text_style['backgroundColor']
-                    style_fields.append('backgroundColor')
-
-                # Handle font size
-                if 'fontSize' in text_style:
-                    style_update['fontSize'] = text_style['fontSize']
-                    style_fields.append('fontSize')
-
-                # Handle links - ensure proper structure
-                if 'link' in text_style:
-                    link_data = text_style['link']
-                    # Links can have url, bookmarkId, or headingId
-                    if isinstance(link_data, dict) and ('url' in link_data or 'bookmarkId' in link_data or 'headingId' in link_data):
-                        style_update['link'] = link_data
-                        style_fields.append('link')
-
-                if style_fields and current_index + text_len - 1 > current_index:
-                    # Don't include trailing newline in text style range
-                    end_idx = current_index + text_len
-                    if text.endswith('\n'):
-                        end_idx -= 1
-
-                    if end_idx > current_index:
-                        format_requests.append({
-                            'updateTextStyle': {
-                                'range': {'startIndex': current_index, 'endIndex': end_idx},
-                                'textStyle': style_update,
-                                'fields': ','.join(style_fields)
-                            }
-                        })
+    # Step 2: Apply paragraph styles, text styles, and bullets.
+    # Send styles and bullets as one ordered stream in as few batchUpdate calls
+    # as possible. Requests within a batchUpdate are applied in order, so the
+    # bullets still land after all styling, and no pacing sleeps are needed.
+    complete = True
 
-            current_index += text_len
+    def formatting_failed(batch, e):
+        nonlocal complete
+        complete = False
+        print(f"  Warning: Could not apply {len(batch)} formatting request(s): {e}")
 
-    if format_requests:
-        # Batch format requests (up to 50 at a time to be safe)
-        for i in range(0, len(format_requests), 50):
-            batch = format_requests[i:i+50]
-            try:
-                docs_service.documents().batchUpdate(
-                    documentId=dest_doc_id,
-                    body={'requests': batch}
-                ).execute()
-                time.sleep(0.5)  # Small delay between batches
-            except Exception as e:
-                print(f"  Warning: Could not apply some formatting: {e}")
-
-    # Step 2b: Apply bullet formatting in a separate pass.
-    # This must happen after all text insertion and paragraph styling to avoid
-    # index conflicts. We collect contiguous bullet ranges, determine whether
-    # they are numbered or bulleted, and send createParagraphBullets requests.
-    bullet_requests = []
-    bullet_index = 1  # mirrors current_index tracking above
-
-    for named_style, text_runs, bullet in paragraphs:
-        para_start = bullet_index
-        para_len = sum(len(text) for text, _ in text_runs)
-
-        if bullet:
-            # Determine if numbered or bulleted by checking source list properties
-            list_id = bullet.get('listId', '')
-            preset = 'BULLET_DISC_CIRCLE_SQUARE'  # default to unordered
-
-            if list_id and list_id in source_lists:
-                list_props = source_lists[list_id]
-                nesting_levels = list_props.get('listProperties', {}).get('nestingLevels', [])
-                if nesting_levels:
-                    first_level = nesting_levels[0]
-                    glyph_type = first_level.get('glyphType', '')
-                    # Numbered list glyph types: DECIMAL, ALPHA, ROMAN, ZERO_DECIMAL, UPPER_ALPHA, UPPER_ROMAN
-                    if glyph_type in ('DECIMAL', 'ALPHA', 'ROMAN', 'ZERO_DECIMAL', 'UPPER_ALPHA', 'UPPER_ROMAN'):
-                        preset = 'NUMBERED_DECIMAL_ALPHA_ROMAN'
-
-            bullet_requests.append({
-                'createParagraphBullets': {
-                    'range': {
-                        'startIndex': para_start,
-                        'endIndex': para_start + para_len
-                    },
-                    'bulletPreset': preset
-                }
-            })
-
-        bullet_index += para_len
-
-    if bullet_requests:
-        for i in range(0, len(bullet_requests), 50):
-            batch = bullet_requests[i:i+50]
-            try:
-                docs_service.documents().batchUpdate(
-                    documentId=dest_doc_id,
-                    body={'requests': batch}
-                ).execute()
-                time.sleep(0.5)
-            except Exception as e:
-                print(f"  Warning: Could not apply some bullet formatting: {e}")
+    batch_update(docs_service, dest_doc_id, format_requests + bullet_requests,
+                 on_error=formatting_failed)
 
     # Step 3: Handle tables - need to insert them and fill content
     # Tables are more complex because we need to:
@@ -690,16 +990,24 @@ def copy_doc_content_to_existing(docs_service, source_doc_id: str, dest_doc_id:
     # 2. Insert table structure
     # 3. Fill table cells
 
+    def keep_table_content(batch, e):
+        # A batchUpdate is atomic, so a failed style also undid the table and
+        # text around it. Styles don't move any indices, so resending the rest
+        # of the batch keeps the content and later batches in place.
+        content = [request for request in batch if 'updateTextStyle' not in request]
+        if len(content) == len(batch):
+            raise e
+        nonlocal complete
+        complete = False
+        print(f"  Warning: Could not apply {len(batch) - len(content)} table cell style request(s): {e}")
+        if content:
+            batch_update(docs_service, dest_doc_id, content, retry_statuses=CONTENT_RETRY_STATUSES)
+
     if table_info:
+        cell_styles = {}  # Shared cell_text_style cache for all tables
+
         # Process tables in reverse order to avoid index shifting issues
-        for text_pos, table in reversed(table_info):
-            # Calculate where this table's placeholder is in the document
-            placeholder_start = 1  # Start at beginning
-            for i in range(text_pos):
-                # paragraphs[i] = (named_style, text_runs, bullet)
-                # text_runs = [(text, text_style), ...]
-                para_len = sum(len(text) for text, _ in paragraphs[i][1])
-                placeholder_start += para_len
+        for placeholder_start, table in reversed(table_info):
 
             rows = table.get('rows', 0)
             cols = table.get('columns', 0)
@@ -723,224 +1031,85 @@ def copy_doc_content_to_existing(docs_service, source_doc_id: str, dest_doc_id:
                 }
             ]
 
-            docs_service.documents().batchUpdate(
-                documentId=dest_doc_id,
-                body={'requests': requests}
-            ).execute()
-
-            # Delay between tables to avoid rate limits
-            time.sleep(1.5)
-
-            # Get updated doc to find cell indices
-            updated_doc = docs_service.documents().get(documentId=dest_doc_id).execute()
-            dest_content = updated_doc.get('body', {}).get('content', [])
-
-            # Find the table we just inserted (should be at placeholder_start)
-            dest_table = None
-            for elem in dest_content:
-                if 'table' in elem and elem.get('startIndex', 0) >= placeholder_start - 1:
-                    dest_table = elem['table']
-                    break
-
-            if dest_table:
-                # Fill table cells, preserving text styles (bold, links, etc.)
-                source_rows = table.get('tableRows', [])
-                dest_rows = dest_table.get('tableRows', [])
-
-                # Step 1: Collect source cell data by (row, col) position
-                # Store: {(row, col): [(text, text_style), ...]}
-                source_cell_data = {}
-
-                for row_idx, source_row in enumerate(source_rows):
-                    source_cells = source_row.get('tableCells', [])
-                    for col_idx, source_cell in enumerate(source_cells):
-                        text_runs = []
-                        for content in source_cell.get('content', []):
-                            if 'paragraph' in content:
-                                for elem in content['paragraph'].get('elements', []):
-                                    if 'textRun' in elem:
-                                        text = elem['textRun'].get('content', '')
-                                        style = elem['textRun'].get('textStyle', {})
-                                        if text:
-                                            text_runs.append((text, style))
-                        if text_runs:
-                            # Strip trailing newline from last text run
-                            last_text, last_style = text_runs[-1]
-                            if last_text.endswith('\n'):
-                                text_runs[-1] = (last_text.rstrip('\n'), last_style)
-                            source_cell_data[(row_idx, col_idx)] = text_runs
-
-                # Step 2: Insert text into all cells (collect inserts, execute in reverse)
-                cell_inserts = []  # [(insert_idx, row, col, full_text), ...]
-
-                for row_idx, dest_row in enumerate(dest_rows):
-                    dest_cells = dest_row.get('tableCells', [])
-                    for col_idx, dest_cell in enumerate(dest_cells):
-                        if (row_idx, col_idx) in source_cell_data:
-                            text_runs = source_cell_data[(row_idx, col_idx)]
-                            full_text = ''.join(t for t, s in text_runs)
-                            if full_text:
-                                dest_cell_content = dest_cell.get('content', [])
-                                if dest_cell_content and 'paragraph' in dest_cell_content[0]:
-                                    insert_idx = dest_cell_content[0].get('startIndex', 0)
-                                    cell_inserts.append((insert_idx, row_idx, col_idx, full_text))
-
-                if cell_inserts:
-                    # Insert in reverse order to avoid index shifting during insertion
-                    cell_inserts.sort(key=lambda x: x[0], reverse=True)
-                    insert_requests = [{
-                        'insertText': {
-                            'location': {'index': idx},
-                            'text': text
-                        }
-                    } for idx, row, col, text in cell_inserts]
-
-                    docs_service.documents().batchUpdate(
-                        documentId=dest_doc_id,
-                        body={'requests': insert_requests}
-                    ).execute()
-
-                    # Step 3: Re-fetch document to get NEW indices after text insertion
-                    time.sleep(0.3)
-                    updated_doc = docs_service.documents().get(documentId=dest_doc_id).execute()
-                    updated_content = updated_doc.get('body', {}).get('content', [])
-
-                    # Find the table again with updated indices
-                    updated_table = None
-                    for elem in updated_content:
-                        if 'table' in elem and elem.get('startIndex', 0) >= placeholder_start - 1:
-                            updated_table = elem['table']
-                            break
-
-                    if updated_table:
-                        # Step 4: Apply text styles using NEW indices from updated table
-                        style_requests = []
-                        updated_rows = updated_table.get('tableRows', [])
-
-                        for row_idx, updated_row in enumerate(updated_rows):
-                            updated_cells = updated_row.get('tableCells', [])
-                            for col_idx, updated_cell in enumerate(updated_cells):
-                                if (row_idx, col_idx) not in source_cell_data:
-                                    continue
-
-                                text_runs = source_cell_data[(row_idx, col_idx)]
-
-                                # Get the starting index of this cell's content
-                                cell_content = updated_cell.get('content', [])
-                                if not cell_content or 'paragraph' not in cell_content[0]:
-                                    continue
-
-                                current_idx = cell_content[0].get('startIndex', 0)
-
-                                for text, text_style in text_runs:
-                                    text_len = len(text)
-                                    if text_len > 0 and text_style:
-                                        style_update = {}
-                                        style_fields = []
-
-                                        if text_style.get('bold'):
-                                            style_update['bold'] = True
-                                            style_fields.append('bold')
-                                        if text_style.get('italic'):
-                                            style_update['italic'] = True
-                                            style_fields.append('italic')
-                                        if text_style.get('underline'):
-                                            style_update['underline'] = True
-                                            style_fields.append('underline')
-
-                                        # Handle links
-                                        if 'link' in text_style:
-                                            link_data = text_style['link']
-                                            if isinstance(link_data, dict) and ('url' in link_data or 'bookmarkId' in link_data or 'headingId' in link_data):
-                                                style_update['link'] = link_data
-                                                style_fields.append('link')
-
-                                        if style_fields:
-                                            end_idx = current_idx + text_len
-                                            if end_idx > current_idx:
-                                                style_requests.append({
-                                                    'updateTextStyle': {
-                                                        'range': {'startIndex': current_idx, 'endIndex': end_idx},
-                                                        'textStyle': style_update,
-                                                        'fields': ','.join(style_fields)
-                                                    }
-                                                })
-                                    current_idx += text_len
-
-                        if style_requests:
-                            # Batch in groups with delays to avoid rate limits
-                            for i in range(0, len(style_requests), 20):
-                                batch = style_requests[i:i+20]
-                                try:
-                                    docs_service.documents().batchUpdate(
-                                        documentId=dest_doc_id,
-                                        body={'requests': batch}
-                                    ).execute()
-                                    time.sleep(1.5)  # Rate limit delay
-                                except Exception as e:
-                                    if 'Quota exceeded' in str(e) or '429' in str(e):
-                                        print(f"  Rate limit hit on table styles, waiting 60s...")
-                                        time.sleep(60)
-                                        docs_service.documents().batchUpdate(
-                                            documentId=dest_doc_id,
-                                            body={'requests': batch}
-                                        ).execute()
-                                    else:
-                                        print(f"  Warning: Could not apply some table cell styles: {e}")
-
-                    # Apply 11pt font to all table cells to override any inherited styles
-                    # Need to re-fetch doc to get updated indices
-                    time.sleep(0.2)
-                    updated_doc2 = docs_service.documents().get(documentId=dest_doc_id).execute()
-                    dest_content2 = updated_doc2.get('body', {}).get('content', [])
-
-                    # Find the table again
-                    for elem in dest_content2:
-                        if 'table' in elem and elem.get('startIndex', 0) >= placeholder_start - 1:
-                            tbl = elem['table']
-                            font_requests = []
-                            for tbl_row in tbl.get('tableRows', []):
-                                for tbl_cell in tbl_row.get('tableCells', []):
-                                    for cell_content in tbl_cell.get('content', []):
-                                        if 'paragraph' in cell_content:
-                                            cell_start = cell_content.get('startIndex', 0)
-                                            cell_end = cell_content.get('endIndex', cell_start)
-                                            if cell_end - 1 > cell_start:
-                                                font_requests.append({
-                                                    'updateTextStyle': {
-                                                        'range': {
-                                                            'startIndex': cell_start,
-                                                            'endIndex': cell_end - 1
-                                                        },
-                                                        'textStyle': {
-                                                            'fontSize': {
-                                                                'magnitude': 11,
-                                                                'unit': 'PT'
-                                                            }
-                                                        },
-                                                        'fields': 'fontSize'
-                                                    }
-                                                })
-                            if font_requests:
-                                docs_service.documents().batchUpdate(
-                                    documentId=dest_doc_id,
-                                    body={'requests': font_requests}
-                                ).execute()
-                            break
-
-
-def upload_to_drive(docx_path: str, title: str, folder_id: str = None, existing_doc_id: str = None):
+            # The inserted table's cell positions follow from its size, so compute
+            # them locally instead of re-fetching the document
+            cell_starts = table_cell_starts(placeholder_start, rows, cols)
+
+            # Fill table cells, preserving text styles (bold, links, etc.)
+            source_rows = table.get('tableRows', [])
+
+            # Steps 1-2: Walk the source table once, pairing each cell that has
+            # text with its position, flattened in document order
+            cell_inserts = []  # [(insert_idx, text_runs, full_text), ...]
+
+            for row, row_starts in zip(source_rows, cell_starts):
+                for cell, insert_idx in zip(row.get('tableCells', []), row_starts):
+                    text_runs = extract_cell_runs(cell)
+                    if not text_runs:
+                        continue
+                    full_text = ''.join(t for t, s in text_runs)
+                    if full_text:
+                        cell_inserts.append((insert_idx, text_runs, full_text))
+
+            # Step 3: Fill cells from last to first, so each insertion leaves the
+            # indices of the cells still to be filled unchanged. Each cell's text
+            # styles and font size follow its insertText in the same batchUpdate,
+            # at indices computed from the empty table's layout.
+            for insert_idx, text_runs, full_text in reversed(cell_inserts):
+                requests.append({
+                    'insertText': {
+                        'location': {'index': insert_idx},
+                        'text': full_text
+                    }
+                })
+
+                run_styles = [(text, cell_text_style(text_style, cell_styles) if text_style else None)
+                              for text, text_style in text_runs if text]
+                first_style = run_styles[0][1]
+
+                # When the whole cell shares one style (cached styles are shared
+                # objects), the 11pt override rides in that style's request
+                if first_style and all(cell_style is first_style for t, cell_style in run_styles):
+                    style_update, fields = first_style
+                    requests.append(text_style_request(
+                        insert_idx, insert_idx + len(full_text),
+                        {**style_update, 'fontSize': CELL_FONT_SIZE}, fields + ',fontSize'))
+                    continue
+
+                # Each run starts where the runs before it end
+                run_starts = accumulate((len(text) for text, s in run_styles), initial=insert_idx)
+                for (text, cell_style), start in zip(run_styles, run_starts):
+                    if cell_style:
+                        style_update, fields = cell_style
+                        requests.append(text_style_request(start, start + len(text), style_update, fields))
+
+                # Apply 11pt font to the cell text to override any inherited styles
+                requests.append(text_style_request(
+                    insert_idx, insert_idx + len(full_text), {'fontSize': CELL_FONT_SIZE}, 'fontSize'))
+
+            # One ordered stream per table: create it, then fill and style its cells
+            batch_update(docs_service, dest_doc_id, requests, on_error=keep_table_content,
+                         retry_statuses=CONTENT_RETRY_STATUSES)
+
+    return complete
+
+
+def upload_to_drive(docx_path: str, title: str, folder_id: str = None, existing_doc: dict = None):
     """Upload docx to Google Drive and convert to Google Docs.
 
-    If existing_doc_id is provided, updates the existing doc in place by:
+    If existing_doc (the result of get_existing_doc) is provided, updates that
+    doc in place by:
     1. Creating a temp doc from the new docx
     2. Clearing the existing doc
     3. Copying content from temp to existing (preserves URL)
     4. Deleting the temp doc
+
+    Returns (doc_id, url, complete), where complete is False if the in-place
+    copy could not apply all of its formatting.
     """
-    creds = get_credentials()
-    drive_service = build('drive', 'v3', credentials=creds)
-    docs_service = build('docs', 'v1', credentials=creds)
+    drive_service = get_service('drive', 'v3')
+    docs_service = get_service('docs', 'v1')
+    existing_doc_id = existing_doc['id'] if existing_doc else None
 
     # First, always upload the docx as a new doc (temp if updating)
     file_metadata = {
@@ -951,10 +1120,13 @@ def upload_to_drive(docx_path: str, title: str, folder_id: str = None, existing_
     if folder_id and not existing_doc_id:
         file_metadata['parents'] = [folder_id]
 
+    # Small files skip the extra round-trip that starts a resumable session
+    resumable = os.path.getsize(docx_path) > SIMPLE_UPLOAD_MAX_BYTES
     media = MediaFileUpload(
         docx_path,
         mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        resumable=True
+        resumable=resumable,
+        chunksize=RESUMABLE_CHUNK_BYTES
     )
 
     new_file = drive_service.files().create(
@@ -967,33 +1139,20 @@ def upload_to_drive(docx_path: str, title: str, folder_id: str = None, existing_
 
     if existing_doc_id:
         try:
-            # Verify the existing doc exists and get its folder
-            existing = drive_service.files().get(
-                fileId=existing_doc_id,
-                fields='parents'
-            ).execute()
-            if not folder_id and existing.get('parents'):
-                folder_id = existing['parents'][0]
-
             # Clear the existing document
             print(f"  Clearing existing document...")
             clear_document_content(docs_service, existing_doc_id)
 
             # Copy content from new doc to existing
             print(f"  Copying new content to existing document...")
-            copy_doc_content_to_existing(docs_service, new_doc_id, existing_doc_id)
+            complete = copy_doc_content_to_existing(docs_service, new_doc_id, existing_doc_id)
 
             # Delete the temp doc
             drive_service.files().delete(fileId=new_doc_id).execute()
             print(f"  Cleaned up temp document")
 
-            # Get the existing doc's URL
-            existing_file = drive_service.files().get(
-                fileId=existing_doc_id,
-                fields='webViewLink'
-            ).execute()
-
-            return existing_doc_id, existing_file.get('webViewLink')
+            # Updating in place keeps the doc's URL
+            return existing_doc_id, existing_doc.get('webViewLink'), complete
 
         except Exception as e:
             # Clean up temp doc
@@ -1003,7 +1162,7 @@ def upload_to_drive(docx_path: str, title: str, folder_id: str = None, existing_
                 pass
 
             # Don't create a new doc - preserve the original URL
-            if 'Quota exceeded' in str(e) or '429' in str(e):
+            if isinstance(e, HttpError) and e.resp.status == 429:
                 print(f"\n  ERROR: Rate limit exceeded. Please wait a minute and try again.")
                 print(f"  Original document preserved: {existing_doc_id}")
                 sys.exit(1)
@@ -1012,29 +1171,41 @@ def upload_to_drive(docx_path: str, title: str, folder_id: str = None, existing_
                 print(f"  Original document preserved: {existing_doc_id}")
                 sys.exit(1)
 
-    return new_doc_id, new_file.get('webViewLink')
+    return new_doc_id, new_file.get('webViewLink'), True
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Convert Markdown to Google Docs'
-    )
-    parser.add_argument('input', help='Input markdown file')
-    parser.add_argument('-t', '--title', help='Document title (default: filename)')
-    parser.add_argument('-f', '--folder', help='Google Drive folder ID to upload to')
-    parser.add_argument('--reference-doc', help='Word template for styling')
-    parser.add_argument('--keep-docx', action='store_true', help='Keep intermediate docx file')
-    parser.add_argument('--new', action='store_true', help='Force create new doc (ignore existing ID)')
-    parser.add_argument('--no-save-id', action='store_true', help='Do not save doc ID to markdown file')
+def content_hash(content: str, reference_doc: str = None) -> str:
+    """Hash the markdown (and reference template) a doc is built from."""
+    key = hashlib.blake2b(content.encode('utf-8'), digest_size=16)
+    if reference_doc and os.path.exists(reference_doc):
+        key.update(Path(reference_doc).read_bytes())
+    return key.hexdigest()
 
-    args = parser.parse_args()
 
-    # Validate input
-    input_path = Path(args.input)
-    if not input_path.exists():
-        print(f"Error: File not found: {args.input}")
+def get_existing_doc(doc_id: str) -> dict:
+    """Get the Drive metadata an in-place update needs, exiting if the doc can't be read."""
+    try:
+        return get_service('drive', 'v3').files().get(
+            fileId=doc_id,
+            fields=EXISTING_DOC_FIELDS
+        ).execute()
+    except HttpError as e:
+        print(f"\n  ERROR: Could not read existing document: {e}")
+        print(f"  Original document preserved: {doc_id}")
         sys.exit(1)
 
+
+def save_content_hash(doc_id: str, md_hash: str = None):
+    """Store the content hash in the doc's Drive appProperties (None removes it)."""
+    get_service('drive', 'v3').files().update(
+        fileId=doc_id,
+        body={'appProperties': {CONTENT_HASH_PROPERTY: md_hash}},
+        fields='id'
+    ).execute()
+
+
+def upload_markdown_file(input_path: Path, args) -> str:
+    """Convert a markdown file and upload it as a Google Doc, returning the doc URL."""
     # Read markdown and check for existing doc ID
     with open(input_path, 'r') as f:
         content = f.read()
@@ -1047,34 +1218,71 @@ def main():
     # Determine title
     title = args.title or input_path.stem
 
+    # Use provided reference doc, or default if it exists
+    reference_doc = args.reference_doc
+    if not reference_doc and DEFAULT_REFERENCE_DOC.exists():
+        reference_doc = str(DEFAULT_REFERENCE_DOC)
+        print(f"Using default reference template for styling")
+
+    md_hash = content_hash(clean_content, reference_doc)
+    existing_doc = get_existing_doc(existing_doc_id) if existing_doc_id and not args.new else None
+    stored_hash = existing_doc.get('appProperties', {}).get(CONTENT_HASH_PROPERTY) if existing_doc else None
+
+    # If the doc was last built from identical markdown, its content is current:
+    # skip pandoc, the upload and the clear/copy, and only reapply styles
+    if stored_hash == md_hash and not args.force and not args.keep_docx:
+        doc_url = existing_doc.get('webViewLink')
+        print(f"{input_path.name} is unchanged since the last upload, skipping conversion")
+        print("Applying document styles...")
+        apply_document_styles(existing_doc_id)
+
+        print(f"\nSuccess!")
+        print(f"Document ID: {existing_doc_id}")
+        print(f"URL: {doc_url}")
+        return doc_url
+
+    # Forget the stored hash before the doc is touched, so an update that fails
+    # part way leaves nothing claiming the doc is current
+    if stored_hash:
+        try:
+            save_content_hash(existing_doc_id)
+        except HttpError as e:
+            print(f"\n  ERROR: Could not clear content hash: {e}")
+            print(f"  Original document preserved: {existing_doc_id}")
+            sys.exit(1)
+
     # Create temp docx
     with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
         docx_path = tmp.name
 
     try:
-        # Use provided reference doc, or default if it exists
-        reference_doc = args.reference_doc
-        if not reference_doc and DEFAULT_REFERENCE_DOC.exists():
-            reference_doc = str(DEFAULT_REFERENCE_DOC)
-            print(f"Using default reference template for styling")
-
         print(f"Converting {input_path.name} to docx...")
         convert_markdown_to_docx(str(input_path), docx_path, reference_doc, clean_content)
 
         action = "Updating" if (existing_doc_id and not args.new) else "Uploading"
         print(f"{action} Google Doc '{title}'...")
 
-        doc_id, doc_url = upload_to_drive(
+        doc_id, doc_url, complete = upload_to_drive(
             docx_path,
             title,
             args.folder,
-            existing_doc_id if not args.new else None
+            existing_doc
         )
 
         # Apply document styles (headings, tables, etc.)
         print("Applying document styles...")
         apply_document_styles(doc_id)
 
+        # Remember what the doc was built from so unchanged re-runs can skip the
+        # upload. A partial copy leaves no hash, so the next run redoes it.
+        if complete:
+            try:
+                save_content_hash(doc_id, md_hash)
+            except HttpError as e:
+                print(f"  Warning: Could not save content hash: {e}")
+        else:
+            print("  Some formatting failed; the next run will upload this file again")
+
         print(f"\nSuccess!")
         print(f"Document ID: {doc_id}")
         print(f"URL: {doc_url}")
@@ -1089,11 +1297,77 @@ def main():
             os.rename(docx_path, kept_path)
             print(f"Docx saved: {kept_path}")
 
+        return doc_url
+
     finally:
         # Clean up temp file
         if os.path.exists(docx_path) and not args.keep_docx:
             os.remove(docx_path)
 
 
+def upload_many(paths: list, args, workers: int = DEFAULT_PARALLEL) -> int:
+    """Upload several markdown files concurrently, returning the number that failed.
+
+    Uploads spend most of their time waiting on the Google APIs, so threads overlap
+    well; Docs writes from all threads share one rate limiter.
+    """
+    # Authenticate up front so any OAuth prompt happens once, before the threads start
+    get_credentials()
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(upload_markdown_file, path, args): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                future.result()
+            except SystemExit:
+                # The error was already reported by the failing step
+                failures += 1
+                print(f"Failed: {path.name}")
+            except Exception as e:
+                failures += 1
+                print(f"Error uploading {path.name}: {e}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert Markdown to Google Docs'
+    )
+    parser.add_argument('input', nargs='+', help='Input markdown file(s)')
+    parser.add_argument('-t', '--title', help='Document title (default: filename)')
+    parser.add_argument('-f', '--folder', help='Google Drive folder ID to upload to')
+    parser.add_argument('--reference-doc', help='Word template for styling')
+    parser.add_argument('--keep-docx', action='store_true', help='Keep intermediate docx file')
+    parser.add_argument('--new', action='store_true', help='Force create new doc (ignore existing ID)')
+    parser.add_argument('--no-save-id', action='store_true', help='Do not save doc ID to markdown file')
+    parser.add_argument('--force', action='store_true', help='Re-upload even if the markdown is unchanged')
+    parser.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL, metavar='N',
+                        help=f'Files to upload at once when given several (default: {DEFAULT_PARALLEL})')
+
+    args = parser.parse_args()
+
+    # Validate input
+    input_paths = [Path(path) for path in args.input]
+    for input_path in input_paths:
+        if not input_path.exists():
+            print(f"Error: File not found: {input_path}")
+            sys.exit(1)
+
+    if len(input_paths) == 1:
+        upload_markdown_file(input_paths[0], args)
+        return
+
+    if args.title:
+        print("Error: --title can only be used with a single input file")
+        sys.exit(1)
+
+    failures = upload_many(input_paths, args, max(1, min(args.parallel, len(input_paths))))
+    print(f"\nUploaded {len(input_paths) - failures}/{len(input_paths)} file(s)")
+    if failures:
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     main()